@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+"""
+Supplemental script which checks a whole blueprint without Gimp.
+
+Find broken ``next`` references and other structural errors before any
+card is assembled. Run this script directly to check an XML file::
+
+    python analyzer.py Blueprint.xml
+"""
+
+
+__all__ = ['Analyzer']
+# Needs :class:`blueprint`. See below.
+__version__ = None
+__author__ = None
+
+
+import argparse
+import os
+import sys
+
+# Same folder as this script.
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import blueprint  # nopep8
+
+
+__version__ = blueprint.__version__
+__author__ = blueprint.__author__
+
+
+def main(argv=None):
+    """ Check the given blueprint and print a report.
+
+    :param argv: Command line arguments, defaults to :data:`sys.argv`
+    :type argv: list or None, optional
+    :return: Exit code, 1 if an error was found
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description='Check an XML blueprint.')
+    parser.add_argument('xml_file', help='Blueprint to be checked.')
+    parser.add_argument(
+        '--card', action='append', dest='card_IDs', metavar='CARD_ID',
+        help='Card ID to start from (repeatable). Inferred by default.')
+    parser.add_argument('--limit', type=int, default=5,
+                        help='Number of the deepest chains to list.')
+    args = parser.parse_args(argv)
+
+    report = Analyzer(blueprint.Blueprint(args.xml_file)).analyze(
+        args.card_IDs, args.limit)
+    for line in format_report(report):
+        print(line)
+    return 1 if Analyzer.has_errors(report) else 0
+
+
+def format_report(report):
+    """ Human readable form of :meth:`Analyzer.analyze` output.
+
+    :param report: Analysis result
+    :type report: dict
+    :return: Lines of text
+    :rtype: list
+    """
+    lines = ['Cards: {}'.format(len(report['cards']))]
+    for source, target in report['dangling']:
+        lines.append('ERROR dangling next in "{}": "{}"'.format(
+            source, target))
+    for cycle in report['cycles']:
+        lines.append('ERROR cycle: {}'.format(
+            ' -> '.join('"{}"'.format(path) for path in cycle)))
+    for card_ID, layer_name in report['missing_layer_type']:
+        lines.append('ERROR layer "{}" of "{}" is missing layer_type.'.format(
+            layer_name, card_ID))
+    for template in report['unreached_templates']:
+        lines.append('WARNING template not reached by any card: "{}"'.format(
+            template))
+    for depth, chain in report['deepest_chains']:
+        lines.append('Depth {}: {}'.format(
+            depth, ' -> '.join('"{}"'.format(path) for path in chain)))
+    return lines
+
+
+class Analyzer():
+    """ Static analysis of the whole blueprint dict tree.
+
+    The structural checks visit every node and every ``next`` reference
+    a constant number of times. Only layer names are merged along
+    ``next`` references. No card is rendered or even resolved.
+
+    :param blueprint_: Loaded blueprint
+    :type blueprint_: :class:`blueprint.Blueprint`
+    """
+
+    def __init__(self, blueprint_):
+        self.blueprint = blueprint_
+        self.nodes = {}  # dict { path: dict tree node }
+        self.children = {}  # dict { path: [child path] }
+        self.nexts = {}  # dict { path: [existing next target] }
+        self.dangling = []  # list [(path, missing next target)]
+        self._index()
+
+    def _index(self):
+        """ Assign a path to each node and sort out ``next`` targets. """
+        stack = [('', self.blueprint.data)]
+        while stack:
+            path, node = stack.pop()
+            children = []
+            for key, value in node.items():
+                if isinstance(value, dict):
+                    child_path = ' '.join((path, key)) if path else key
+                    children.append(child_path)
+                    stack.append((child_path, value))
+            self.nodes[path] = node
+            self.children[path] = children
+
+        # Targets are looked up only after all the nodes are known.
+        for path, node in self.nodes.items():
+            self.nexts[path] = []
+            for target in node.get('next', []):
+                paths = self._target_paths(target) if target else []
+                if paths:
+                    self.nexts[path].extend(paths)
+                else:
+                    self.dangling.append((path, target))
+        self.dangling.sort()
+
+    def _target_paths(self, target):
+        """ Nodes a ``next`` target stands for.
+
+        Same as :meth:`blueprint.Blueprint._goto`: a virtual card ID
+        (see :meth:`blueprint.Blueprint.generate_variant_IDs`) stands
+        for the chosen values of all axes followed by the card.
+
+        :param target: Space separated path
+        :type target: str
+        :return: Paths, empty if the target does not exist
+        :rtype: list
+        """
+        if target in self.nodes:
+            return [target]
+        steps = target.split(' ')
+        i = 1
+        while ' '.join(steps[:i]) in self.nodes:
+            i += 1
+        base = ' '.join(steps[:i - 1])
+        variants = ' '.join((base, blueprint.Blueprint.VARIANTS))
+        if i == 1 or variants not in self.nodes:
+            return []
+        axes = sorted(self.children[variants])
+        if len(steps) - (i - 1) != len(axes):
+            return []
+        paths = [' '.join((axis, value))
+                 for axis, value in zip(axes, steps[i - 1:])]
+        if not all(path in self.nodes for path in paths):
+            return []
+        return paths + [base]
+
+    def analyze(self, card_IDs=None, limit=5):
+        """ Check the blueprint.
+
+        The report holds these keys:
+
+        * ``cards``: checked card IDs
+        * ``dangling``: ``(path, target)`` of ``next`` tags pointing
+          to a non-existent node
+        * ``cycles``: lists of paths, each closing on its first item
+        * ``unreached_templates``: topmost nodes of template subtrees
+          (see :meth:`_template_roots`) no card reaches
+        * ``deepest_chains``: ``(depth, chain)`` of the cards with the
+          longest ``next`` chain, the chain listing the card and targets
+        * ``missing_layer_type``: ``(card_ID, layer_name)`` of resolved
+          layers without ``layer_type``
+
+        :param card_IDs: Paths to starting nodes, defaults to None
+            (see :meth:`infer_cards`)
+        :type card_IDs: list or None, optional
+        :param limit: Number of the deepest chains, defaults to 5
+        :type limit: int, optional
+        :return: Report
+        :rtype: dict
+        """
+        if card_IDs is None:
+            card_IDs = self.infer_cards()
+        cycles, depth, successor, order = self._walk()
+
+        chains = []
+        for card_ID in card_IDs:
+            if card_ID not in self.nodes:
+                continue
+            chain = [card_ID]
+            path = card_ID
+            while path in successor:
+                path, is_next = successor[path]
+                if is_next:
+                    chain.append(path)
+            chains.append((depth[card_ID], chain))
+        chains.sort(key=lambda item: -item[0])
+
+        return {
+            'cards': list(card_IDs),
+            'dangling': list(self.dangling),
+            'cycles': cycles,
+            'unreached_templates': self._unreached_templates(card_IDs),
+            'deepest_chains': chains[:limit],
+            'missing_layer_type': self._missing_layer_type(card_IDs, order),
+        }
+
+    @staticmethod
+    def has_errors(report):
+        """ Would any of the reported problems break card assembly?
+
+        Unreached templates are only a warning.
+
+        :param report: Output of :meth:`analyze`
+        :type report: dict
+        :rtype: bool
+        """
+        return bool(report['dangling'] or report['cycles']
+                    or report['missing_layer_type'])
+
+    def infer_cards(self):
+        """ Guess card IDs when none are given.
+
+        A card is the topmost node which has a ``next`` tag, variants or
+        only flat children (layer definitions) and is not inside
+        a template subtree (see :meth:`_template_roots`). A card may
+        still be a ``next`` target of another card.
+
+        :return: Sorted card IDs
+        :rtype: list
+        """
+        templates = self._template_roots()
+        cards = []
+        stack = list(self.children[''])
+        while stack:
+            path = stack.pop()
+            if path in templates:
+                continue
+            values = self._variant_values(path)
+            children = [child for child in self.children[path]
+                        if not self._is_variants(child)]
+            flat = all(not self.children[child] for child in children)
+            if flat and (children or values or 'next' in self.nodes[path]):
+                cards.append(path)
+            else:
+                stack.extend(children)
+        return sorted(cards)
+
+    def _template_roots(self):
+        """ Roots of the subtrees referenced from elsewhere.
+
+        For each ``next`` reference, the root is the topmost node holding
+        the target but not the referring node, e.g. "template" for
+        "template spell layout" referred to by "unique spell bolt". A card
+        referring to another card (the target itself being the root) makes
+        no template.
+
+        :rtype: set
+        """
+        roots = set()
+        for path, targets in self.nexts.items():
+            source = path.split(' ') if path else []
+            for target in targets:
+                steps = target.split(' ')
+                # Variant of a card, the card itself is a target too.
+                if blueprint.Blueprint.VARIANTS in steps:
+                    continue
+                common = 0
+                while (common < min(len(source), len(steps))
+                        and source[common] == steps[common]):
+                    common += 1
+                if common < len(steps) - 1:
+                    roots.add(' '.join(steps[:common + 1]))
+        return roots
+
+    def _is_variants(self, path):
+        """ Is the node the ``variants`` tag of a card? """
+        return path.rsplit(' ', 1)[-1] == blueprint.Blueprint.VARIANTS
+
+    def _variant_values(self, path):
+        """ Override nodes of all the card's variants.
+
+        :return: Paths of the values of all axes
+        :rtype: list
+        """
+        variants = ' '.join((path, blueprint.Blueprint.VARIANTS))
+        if variants not in self.nodes:
+            return []
+        return [value for axis in self.children[variants]
+                for value in self.children[axis]]
+
+    def _successors(self, path):
+        """ Nodes visited when resolving the given one.
+
+        :return: Pairs of path and whether it is a ``next`` target
+        :rtype: list
+        """
+        return ([(child, False) for child in self.children[path]]
+                + [(target, True) for target in self.nexts[path]])
+
+    def _walk(self):
+        """ Depth first search over children and ``next`` targets.
+
+        Find cycles and, in post-order, the longest ``next`` chain of
+        each node.
+
+        :return: Cycles, ``{path: depth}``, ``{path: (successor path,
+            is next)}`` along the longest chain and the post-order
+        :rtype: tuple
+        """
+        NEW, OPEN, DONE = 0, 1, 2
+        state = dict.fromkeys(self.nodes, NEW)
+        cycles = []
+        depth = {}
+        successor = {}
+        order = []
+        for root in sorted(self.nodes):
+            if state[root] != NEW:
+                continue
+            state[root] = OPEN
+            stack = [(root, iter(self._successors(root)))]
+            while stack:
+                path, successors = stack[-1]
+                for next_path, is_next in successors:
+                    if state[next_path] == NEW:
+                        state[next_path] = OPEN
+                        stack.append(
+                            (next_path, iter(self._successors(next_path))))
+                        break
+                    elif state[next_path] == OPEN:
+                        opened = [item[0] for item in stack]
+                        cycles.append(
+                            opened[opened.index(next_path):] + [next_path])
+                else:
+                    stack.pop()
+                    state[path] = DONE
+                    order.append(path)
+                    depth[path] = 0
+                    for next_path, is_next in self._successors(path):
+                        # Open nodes are part of a cycle, already reported.
+                        if state[next_path] != DONE:
+                            continue
+                        candidate = depth[next_path] + int(is_next)
+                        if candidate > depth[path]:
+                            depth[path] = candidate
+                            successor[path] = (next_path, is_next)
+        return cycles, depth, successor, order
+
+    def _reach(self, starts, successors):
+        """ All nodes reachable from the given ones.
+
+        :rtype: set
+        """
+        reached = set(starts)
+        stack = list(reached)
+        while stack:
+            for next_path, is_next in successors(stack.pop()):
+                if next_path not in reached:
+                    reached.add(next_path)
+                    stack.append(next_path)
+        return reached
+
+    def _unreached_templates(self, card_IDs):
+        """ Topmost nodes of template subtrees no card reaches.
+
+        A node is listed if neither it nor any of its descendants is
+        reached, while its parent is (or is not a template).
+
+        :rtype: list
+        """
+        reached = self._reach(
+            [card_ID for card_ID in card_IDs if card_ID in self.nodes],
+            self._successors)
+        # Reached nodes and theirs ancestors.
+        covered = set([''])
+        for path in reached:
+            steps = path.split(' ')
+            for i in range(1, len(steps) + 1):
+                covered.add(' '.join(steps[:i]))
+
+        roots = self._template_roots()
+        # Nested roots are visited from the outer ones.
+        stack = [root for root in roots if not any(
+            ' '.join(root.split(' ')[:i]) in roots
+            for i in range(1, root.count(' ') + 1))]
+        unreached = []
+        while stack:
+            path = stack.pop()
+            if path in covered:
+                stack.extend(self.children[path])
+            else:
+                unreached.append(path)
+        return sorted(unreached)
+
+    def _missing_layer_type(self, card_IDs, order):
+        """ Resolved layers without ``layer_type``.
+
+        A layer gets its tags from the same named children of the card
+        and of everything the card's ``next`` tags lead to. Each of
+        those has ``layer_type`` either itself or through its own
+        ``next`` targets. All variants of a card are checked at once.
+
+        Computed bottom-up in the given post-order (see :meth:`_walk`),
+        so every ``next`` target is merged before the nodes referring
+        to it.
+
+        :param order: Post-order of all the nodes
+        :type order: list
+        :rtype: list
+        """
+        typed = {}  # dict { path: has layer_type }
+        layers = {}  # dict { path: { layer name: has layer_type } }
+        for path in order:
+            targets = self.nexts[path]
+            typed[path] = ('layer_type' in self.nodes[path] or any(
+                typed.get(target, False) for target in targets))
+            merged = {}
+            for child in self.children[path]:
+                if not self._is_variants(child):
+                    merged[child.rsplit(' ', 1)[-1]] = typed.get(child, False)
+            for target in targets:
+                for layer_name, is_typed in layers.get(target, {}).items():
+                    merged[layer_name] = merged.get(layer_name) or is_typed
+            if merged:
+                layers[path] = merged
+
+        missing = []
+        for card_ID in card_IDs:
+            if card_ID not in self.nodes:
+                continue
+            merged = {}
+            for path in [card_ID] + self._variant_values(card_ID):
+                for layer_name, is_typed in layers.get(path, {}).items():
+                    merged[layer_name] = merged.get(layer_name) or is_typed
+            missing.extend((card_ID, layer_name)
+                           for layer_name in sorted(merged)
+                           if not merged[layer_name])
+        return missing
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Supplemental script which handles batch bookkeeping.
+
+Record finished cards into a journal file so that an interrupted batch
+can be resumed. Report progress of the running batch.
+"""
+
+
+__all__ = ['Journal', 'Progress']
+# Needs :class:`blueprint`. See below.
+__version__ = None
+__author__ = None
+
+
+import datetime
+import io
+import os
+import sys
+import time
+
+# Same folder as this script.
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import blueprint  # nopep8
+
+
+__version__ = blueprint.__version__
+__author__ = blueprint.__author__
+
+
+def _text(value):
+    """ Make sure the value is unicode (Gimp passes byte strings).
+
+    :param value: Value to be converted
+    :type value: str or bytes
+    :return: Unicode text
+    :rtype: str
+    """
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return u'{}'.format(value)
+
+
+class Journal():
+    """ Record of finished and failed cards of a batch.
+
+    Each record is appended to the journal file as a tab separated line
+    (status, card ID, detail) right away, so the journal survives
+    a crash of the batch.
+
+    :param file_path: Journal file, created if missing
+    :type file_path: str
+    :param resume: Keep records of the previous run, defaults to False
+    :type resume: bool, optional
+    """
+
+    #: Status of a successfully created card. Detail is the output path.
+    DONE = u'done'
+    #: Status of a card which raised an error. Detail is the error message.
+    FAILED = u'failed'
+
+    def __init__(self, file_path, resume=False):
+        self.file_path = file_path
+        self.done = {}  # dict { card ID: output path }
+        self.failed = {}  # dict { card ID: error message }
+        if os.path.exists(file_path):
+            if resume:
+                self._load()
+            else:
+                os.remove(file_path)
+
+    def _load(self):
+        """ Read records of a previous run. Later records win. """
+        with io.open(self.file_path, 'r', encoding='utf-8') as file_:
+            for line in file_:
+                fields = line.rstrip(u'\n').split(u'\t', 2)
+                if len(fields) != 3:
+                    continue
+                status, card_ID, detail = fields
+                if status == self.DONE:
+                    self.done[card_ID] = detail
+                    self.failed.pop(card_ID, None)
+                elif status == self.FAILED:
+                    self.failed[card_ID] = detail
+
+    def is_done(self, card_ID):
+        """ Has the card been finished already?
+
+        :param card_ID: Path to the starting node
+        :type card_ID: str
+        :rtype: bool
+        """
+        return _text(card_ID) in self.done
+
+    def record_done(self, card_ID, output_path=''):
+        """ Record a finished card.
+
+        :param card_ID: Path to the starting node
+        :type card_ID: str
+        :param output_path: Saved image path, defaults to "" (not saved)
+        :type output_path: str, optional
+        """
+        card_ID = _text(card_ID)
+        self.done[card_ID] = _text(output_path)
+        self.failed.pop(card_ID, None)
+        self._write(self.DONE, card_ID, self.done[card_ID])
+
+    def record_failed(self, card_ID, error):
+        """ Record a card which raised an error.
+
+        :param card_ID: Path to the starting node
+        :type card_ID: str
+        :param error: The raised error
+        :type error: Exception
+        """
+        card_ID = _text(card_ID)
+        message = u'{}: {}'.format(type(error).__name__, _text(error))
+        self.failed[card_ID] = u' '.join(message.split())
+        self._write(self.FAILED, card_ID, self.failed[card_ID])
+
+    def _write(self, *fields):
+        """ Append one record to the journal file. """
+        with io.open(self.file_path, 'a', encoding='utf-8') as file_:
+            file_.write(u'\t'.join(fields) + u'\n')
+
+
+class Progress():
+    """ Progress of a batch: count, throughput and estimated time left.
+
+    :param total: Number of cards in the batch
+    :type total: int
+    :param clock: Time source in seconds, defaults to :func:`time.time`
+    :type clock: callable, optional
+    """
+
+    def __init__(self, total, clock=time.time):
+        self.total = total
+        self.count = 0
+        self.clock = clock
+        self.start = clock()
+
+    def step(self):
+        """ Count one more processed card.
+
+        :return: Progress report, see :meth:`report`
+        :rtype: str
+        """
+        self.count += 1
+        return self.report()
+
+    def rate(self):
+        """ Processed cards per second.
+
+        :rtype: float
+        """
+        elapsed = self.clock() - self.start
+        return self.count / float(elapsed) if elapsed > 0 else 0.0
+
+    def eta(self):
+        """ Estimated time left in seconds.
+
+        :return: Seconds left or None if unknown yet
+        :rtype: float or None
+        """
+        rate = self.rate()
+        if not rate:
+            return None
+        return (self.total - self.count) / rate
+
+    def report(self):
+        """ One line progress report.
+
+        E.g. "[612/900] 2.35 cards/s, ETA 0:02:03".
+
+        :rtype: str
+        """
+        eta = self.eta()
+        return '[{}/{}] {:.2f} cards/s, ETA {}'.format(
+            self.count, self.total, self.rate(),
+            '?' if eta is None else datetime.timedelta(seconds=int(eta)))
@@ -7,22 +7,207 @@ by the main script :mod:`cardassembler`.
 """
 
 
-__all__ = ['Blueprint']
+__all__ = ['Blueprint', 'Overlay', 'layout_digest']
 __version__ = '1.5.1'
 __author__ = 'Martin Brajer'
 
 
+import hashlib
+import itertools
 import xml.etree.ElementTree as ET
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2.7 (Gimp).
+    from collections import Mapping
 
 
-def main():
-    path = ''
-    if not path:
-        return
-    blueprint = Blueprint((path + '\\Blueprint.xml').decode('utf-8'))
-    layout = blueprint.generate_layout('unique item example')
-    palette = blueprint.generate_palette('color')
-    pass
+#: Exit code of :func:`main` failing on the blueprint (usage errors exit
+#: by 2, failed ``check`` by 1).
+ERROR_EXIT_CODE = 3
+
+
+def main(argv=None):
+    """ Command line interface, no Gimp needed.
+
+    Run ``python blueprint.py --help`` for the list of commands.
+
+    A missing card or file and malformed XML are reported on a single
+    line of standard error with :data:`ERROR_EXIT_CODE`.
+
+    :param argv: Command line arguments, defaults to :data:`sys.argv`
+    :type argv: list or None, optional
+    :return: Exit code
+    :rtype: int
+    """
+    # Imported here to keep importing this module fast.
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description='Blueprint operations without Gimp.')
+    parser.add_argument('xml_file', help='Blueprint (XML file).')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    command = commands.add_parser(
+        'layout', help='Print resolved layout of a card as JSON.')
+    command.add_argument('card_ID', help='Path to the starting node.')
+    command.add_argument('--strings', nargs=2, metavar=('LANGUAGE', 'FILE'),
+                         help='Translate texts by the string table.')
+
+    command = commands.add_parser(
+        'list', help='List card IDs (variants included) by prefix.')
+    command.add_argument('prefix', nargs='?', default='',
+                         help='Card ID beginning, defaults to all.')
+
+    command = commands.add_parser(
+        'palette', help='Print palette in Gimp palette format (GPL).')
+    command.add_argument('palette_ID', nargs='?', default='color',
+                         help='Path to the colors node, defaults to "color".')
+    command.add_argument('--name', default='Card Assembler Palette',
+                         help='Palette name.')
+
+    command = commands.add_parser(
+        'time', help='Measure layout resolution of the given cards.')
+    command.add_argument('card_IDs', nargs='*', metavar='card_ID',
+                         help='Paths to starting nodes, read from stdin '
+                         '(one per line) if none given.')
+    command.add_argument('--repeat', type=int, default=10,
+                         help='Repetitions of each card after the first '
+                         'resolution, defaults to 10.')
+    command.add_argument('--shared', action='store_true',
+                         help='Use shared layouts (generate_shared_layout).')
+
+    commands.add_parser('check', help='Run the static analyzer.')
+
+    args = parser.parse_args(argv)
+    try:
+        blueprint_ = Blueprint(args.xml_file)
+        return {
+            'layout': _command_layout,
+            'list': _command_list,
+            'palette': _command_palette,
+            'time': _command_time,
+            'check': _command_check,
+        }[args.command](blueprint_, args)
+    except KeyError as error:
+        # Not str(error), which quotes the message.
+        message = error.args[0] if error.args else error
+    except (EnvironmentError, ET.ParseError) as error:
+        message = error
+    sys.stderr.write('{}: error: {}\n'.format(parser.prog, message))
+    return ERROR_EXIT_CODE
+
+
+def _command_layout(blueprint_, args):
+    """ CLI: print a card's layout as JSON. """
+    import json
+
+    language = None
+    if args.strings:
+        language, file_path = args.strings
+        blueprint_.load_strings(language, file_path)
+    layout = blueprint_.generate_shared_layout(args.card_ID, language)
+    print(json.dumps(
+        dict((name, layer.to_dict()) for name, layer in layout),
+        indent=2, sort_keys=True))
+    return 0
+
+
+def _command_list(blueprint_, args):
+    """ CLI: print card IDs starting by the prefix. """
+    import analyzer
+
+    for card_ID in analyzer.Analyzer(blueprint_).infer_cards():
+        for variant_ID in blueprint_.generate_variant_IDs(card_ID):
+            if variant_ID.startswith(args.prefix):
+                print(variant_ID)
+    return 0
+
+
+def _command_palette(blueprint_, args):
+    """ CLI: print palette as a Gimp palette file. """
+    print('GIMP Palette')
+    print('Name: {}'.format(args.name))
+    print('Columns: 1')
+    print('#')
+    for name, color in blueprint_.generate_palette(args.palette_ID):
+        color = color.lstrip('#')
+        if len(color) == 3:
+            color = ''.join(digit * 2 for digit in color)
+        print('{:3d} {:3d} {:3d}\t{}'.format(
+            int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16),
+            name))
+    return 0
+
+
+def _command_time(blueprint_, args):
+    """ CLI: print resolution time of each card and in total.
+
+    The first resolution of a card is timed apart from the repeated ones,
+    which shared layouts serve from the memo.
+    """
+    import sys
+    import timeit
+
+    card_IDs = args.card_IDs or [
+        line.strip() for line in sys.stdin if line.strip()]
+    generate = (blueprint_.generate_shared_layout if args.shared
+                else blueprint_.generate_layout)
+    total = 0.0
+    print('{:>13}  {:>13}  card'.format('first', 'repeated'))
+    for card_ID in card_IDs:
+        start = timeit.default_timer()
+        generate(card_ID)
+        first = timeit.default_timer() - start
+        start = timeit.default_timer()
+        for _ in range(args.repeat):
+            generate(card_ID)
+        repeated = (timeit.default_timer() - start) / max(args.repeat, 1)
+        total += first
+        print('{:10.3f} ms  {:10.3f} ms  {}'.format(
+            first * 1000, repeated * 1000, card_ID))
+    print('{:10.3f} ms  total of the first resolutions of {} cards'.format(
+        total * 1000, len(card_IDs)))
+    return 0
+
+
+def _command_check(blueprint_, args):
+    """ CLI: print the static analysis report. """
+    import analyzer
+
+    report = analyzer.Analyzer(blueprint_).analyze()
+    for line in analyzer.format_report(report):
+        print(line)
+    return 1 if analyzer.Analyzer.has_errors(report) else 0
+
+
+def layout_digest(layout):
+    """ Fingerprint of a resolved layout.
+
+    Cards with equal digests are assembled into the same image. The image
+    name (``name`` of the ``image`` layer) is left out, so the cards can
+    still differ by it.
+
+    :param layout: Output of :meth:`Blueprint.generate_layout` or
+        :meth:`Blueprint.generate_shared_layout`
+    :type layout: list
+    :return: Hex digest
+    :rtype: str
+    """
+    def canonical(value):
+        if isinstance(value, Mapping):
+            return sorted(
+                (key, canonical(item)) for key, item in value.items())
+        return value
+
+    layers = []
+    for name, layer in layout:
+        layer = canonical(layer)
+        if dict(layer).get('layer_type') == 'image':
+            layer = [item for item in layer if item[0] != 'name']
+        layers.append((name, layer))
+    return hashlib.sha1(repr(layers).encode('utf-8')).hexdigest()
 
 
 class Blueprint():
@@ -37,10 +222,21 @@ class Blueprint():
     #: Those tags are always stored in a :class:`list` & have extra treatment
     #: in :meth:`_step_in`.
     SPECIAL_TAGS = ['next', 'text']
+    #: Tag holding variant axes, see :meth:`generate_variant_IDs`. Never
+    #: written into layout.
+    VARIANTS = 'variants'
+    #: Layer types whose ``color`` is refilled by recoloring, see
+    #: :meth:`color_index`.
+    COLORED_LAYER_TYPES = ('monochrome', 'text')
 
     def __init__(self, file_path):
         # Dict tree representation of the given XML file.
         self.data = self._load(file_path) if file_path is not None else None
+        # String tables, see load_strings.
+        self.strings = {}  # dict { language: dict tree }
+        # Shared resolved subtrees. Valid only for the data they came from.
+        self._resolved = {}  # dict { (language, path): :class:`Overlay` }
+        self._resolved_data = None
 
     def _load(self, file_path):
         """ Load XML file blueprint into a dictionary tree.
@@ -114,7 +310,45 @@ class Blueprint():
 
         raise ValueError('Unknown "{}" target type!'.format(target_type))
 
-    def generate_layout(self, start_by):
+    def load_strings(self, language, file_path):
+        """ Load a string table of the given language.
+
+        The table is an XML file mirroring the blueprint's tree, holding
+        only the translated ``text`` tags. A ``text`` tag is translated
+        by the table's ``text`` at the same path, if there is one.
+        Loading a language again replaces its table.
+
+        :param language: Language name
+        :type language: str
+        :param file_path: Path to the XML file to load
+        :type file_path: str
+        """
+        self.strings[language] = self._load(file_path)
+        # Resolved with the previous table, if any.
+        for memo_key in [memo_key for memo_key in self._resolved
+                         if memo_key[0] == language]:
+            del self._resolved[memo_key]
+
+    def _translate(self, this_step, language):
+        """ Text of the given node in the given language.
+
+        :param this_step: Space separated path to the node
+        :type this_step: str
+        :param language: Language loaded by :meth:`load_strings`
+        :type language: str
+        :return: Translated text or None if not translated
+        :rtype: str or None
+        """
+        node = self.strings[language]
+        for step in this_step.split(' '):
+            if not isinstance(node, dict) or step not in node:
+                return None
+            node = node[step]
+        if not isinstance(node, dict) or 'text' not in node:
+            return None
+        return '\n'.join(node['text'])
+
+    def generate_layout(self, start_by, language=None):
         """ Generate card layout given starting position.
 
         Starting position children are sorted alphabetically (name them
@@ -123,13 +357,16 @@ class Blueprint():
         :param start_by: Space separated path through data tree leading
             to the starting node
         :type start_by: str
+        :param language: Translate texts, see :meth:`load_strings`,
+            defaults to None (as in blueprint)
+        :type language: str or None, optional
         :return: Layout of the chosen card
         :rtype: list
         """
-        layers = self._step_in({}, start_by)
+        layers = self._step_in({}, start_by, language)
         return [(name, layers[name]) for name in sorted(layers.keys())]
 
-    def _step_in(self, layout, this_step):
+    def _step_in(self, layout, this_step, language=None):
         """ Browse data guided by the ``next`` tag.
 
         Do not overwrite (first in stays). Further ``next`` tags are served
@@ -140,6 +377,8 @@ class Blueprint():
         :type layout: dict
         :param this_step: Where does this step leads
         :type this_step: str
+        :param language: Translate texts, defaults to None
+        :type language: str or None, optional
         :return: Filled layout
         :rtype: dict
         """
@@ -148,28 +387,94 @@ class Blueprint():
             # Next is not written into layout. It stores further direction.
             if key == 'next':
                 next_steps.extend(value)
+            # Variants are reached by virtual card IDs only.
+            elif key == self.VARIANTS:
+                continue
 
             # If lower levels can be reached.
             elif isinstance(value, dict):
                 if key not in layout:
                     layout[key] = {}
                 layout[key] = self._step_in(
-                    layout[key], ' '.join((this_step, key)))
+                    layout[key], ' '.join((this_step, key)), language)
             # Keys having values from previous levels are NOT changed.
             elif key not in layout:
                 if key == 'text':
                     value = '\n'.join(value)
+                    if language is not None:
+                        value = self._translate(this_step, language) or value
                 layout[key] = value
 
         # Recursively browse all "next" branches.
         for next_step in next_steps:
-            layout = self._step_in(layout, next_step)
+            layout = self._step_in(layout, next_step, language)
         return layout
 
+    def generate_shared_layout(self, start_by, language=None):
+        """ Same as :meth:`generate_layout` without copying.
+
+        Layers are :class:`Overlay` views of resolved subtrees, which are
+        shared among all the layouts generated by this blueprint. Use it
+        when resolving many cards at once.
+
+        :param start_by: Space separated path through data tree leading
+            to the starting node
+        :type start_by: str
+        :param language: Translate texts, see :meth:`load_strings`,
+            defaults to None (as in blueprint)
+        :type language: str or None, optional
+        :return: Layout of the chosen card
+        :rtype: list
+        """
+        layers = self._resolve(start_by, language)
+        return [(name, layers[name]) for name in sorted(layers)]
+
+    def _resolve(self, this_step, language=None):
+        """ Resolve a node once and share the result.
+
+        Shared counterpart of :meth:`_step_in`. The node's own tags come
+        first, then the resolved ``next`` targets in order.
+
+        :param this_step: Space separated path to the node
+        :type this_step: str
+        :param language: Translate texts, defaults to None
+        :type language: str or None, optional
+        :return: Resolved node
+        :rtype: :class:`Overlay`
+        """
+        if self._resolved_data is not self.data:
+            self._resolved = {}
+            self._resolved_data = self.data
+
+        memo_key = (language, this_step)
+        if memo_key not in self._resolved:
+            own = {}
+            next_steps = []
+            for key, value in self._goto(this_step).items():
+                if key == 'next':
+                    next_steps.extend(value)
+                elif key == self.VARIANTS:
+                    continue
+                elif isinstance(value, dict):
+                    own[key] = self._resolve(
+                        ' '.join((this_step, key)), language)
+                elif key == 'text':
+                    own[key] = '\n'.join(value)
+                    if language is not None:
+                        own[key] = (self._translate(this_step, language)
+                                    or own[key])
+                else:
+                    own[key] = value
+            self._resolved[memo_key] = Overlay([own] + [
+                self._resolve(step, language) for step in next_steps])
+        return self._resolved[memo_key]
+
     def _goto(self, next_steps):
         """ Find target dict tree node and return its sub tree.
 
         Analogous to successive application of :meth:`dict.get`.
+        Virtual card IDs (see :meth:`generate_variant_IDs`) lead to
+        a node made up on the fly, which is not stored in the tree.
 
         :param next_steps: Space separated key sequence.
         :type next_steps: str
@@ -178,16 +483,154 @@ class Blueprint():
         :rtype: dict
         """
         data = self.data
+        steps = next_steps.split(' ')
+        i = 0
         # Down the rabbit hole!
-        for next_step in next_steps.split(' '):
-            if next_step in data:
-                data = data[next_step]
+        while i < len(steps):
+            if steps[i] in data:
+                data = data[steps[i]]
+                i += 1
+            elif (i and isinstance(data, dict)
+                    and isinstance(data.get(self.VARIANTS), dict)):
+                variants = data[self.VARIANTS]
+                data = self._variant(' '.join(steps[:i]), variants, steps[i:])
+                i += len(variants)
             else:
                 raise KeyError(
-                    'While browsing the data tree by "{}", keyword "{}"'
-                    'was not found.'.format(next_steps, next_step))
+                    'While browsing the data tree by "{}", keyword "{}" '
+                    'was not found.'.format(next_steps, steps[i]))
         return data
 
+    def _variant(self, base, variants, values):
+        """ Make up a node of the given variant.
+
+        The node has ``next`` tags: the chosen value of each axis
+        (alphabetically by axis) followed by the base node. That way
+        the overrides win over the base. Each variant gets its own image
+        name too, so that no two variants are saved into the same file:
+        the values of the axes which do not name the image are appended
+        to the name, e.g. "Fire bolt (rare)".
+
+        :param base: Space separated path to the node holding variants
+        :type base: str
+        :param variants: The node's ``variants`` sub tree
+        :type variants: dict
+        :param values: Remaining steps, starting by the axes values
+        :type values: list
+        :raises KeyError: If any of the values is not defined
+        :return: Virtual node
+        :rtype: dict
+        """
+        next_steps = []
+        for axis, value in zip(sorted(variants), values):
+            if not isinstance(variants[axis].get(value), dict):
+                raise KeyError(
+                    'Variant "{}" of "{}" has no "{}" value.'.format(
+                        axis, base, value))
+            next_steps.append(' '.join((base, self.VARIANTS, axis, value)))
+        if len(next_steps) < len(variants):
+            raise KeyError('Not all variants of "{}" were chosen.'.format(
+                base))
+        node = {'next': next_steps + [base]}
+        for key, layer in self._resolve(base).items():
+            if not (isinstance(layer, Mapping)
+                    and layer.get('layer_type') == 'image'):
+                continue
+            name = layer.get('name')
+            named = False  # By the first axis overriding the name.
+            appended = []
+            for value, step in zip(values, next_steps):
+                override = self._resolve(step).get(key)
+                if (not named and isinstance(override, Mapping)
+                        and 'name' in override):
+                    name = override['name']
+                    named = True
+                else:
+                    appended.append(value)
+            if name is not None and appended:
+                node[key] = {'name': '{} ({})'.format(
+                    name, ' '.join(appended))}
+        return node
+
+    def generate_variant_IDs(self, card_ID):
+        """ Lazily list all virtual card IDs of the given card.
+
+        A card may define a ``variants`` tag. Its children are axes
+        and theirs children are values holding card overrides. Each
+        combination of values is a virtual card: the card ID followed
+        by the chosen values in alphabetical order of the axes, e.g.
+        "spell bolt fire rare" for axes "element" and "rarity".
+
+        :param card_ID: Path to the starting node
+        :type card_ID: str
+        :return: Virtual card IDs, or just the given one if it has
+            no variants
+        :rtype: iterator
+        """
+        variants = self._goto(card_ID).get(self.VARIANTS)
+        if not isinstance(variants, dict):
+            return iter([card_ID])
+        values = [sorted(variants[axis]) for axis in sorted(variants)]
+        return (' '.join((card_ID,) + combination)
+                for combination in itertools.product(*values))
+
+    def color_index(self, card_IDs):
+        """ Reverse index of colors used by the given cards' layers.
+
+        For each layer of :data:`COLORED_LAYER_TYPES` having a ``color``,
+        find the node whose own ``color`` tag wins (see :meth:`_step_in`),
+        typically a leaf of the color subtree reached by ``next``. Other
+        layers (e.g. a colored layer hidden by ``hide``) are left out.
+
+        :param card_IDs: Paths to starting nodes
+        :type card_IDs: list
+        :return: Index of layers using each color node
+        :rtype: dict { color node path: [(card ID, layer name)] }
+        """
+        sources = {}  # dict { (path, keys): source path or None }, memo
+        index = {}
+        for card_ID in card_IDs:
+            for layer_name, layer in self.generate_shared_layout(card_ID):
+                if ('color' not in layer or layer.get('layer_type')
+                        not in self.COLORED_LAYER_TYPES):
+                    continue
+                source = self._source(card_ID, (layer_name, 'color'), sources)
+                index.setdefault(source, []).append((card_ID, layer_name))
+        return index
+
+    def _source(self, this_step, keys, memo):
+        """ Path of the node supplying the value at the given keys.
+
+        Follows the resolution order of :meth:`_step_in`: the node's own
+        tags first, then its ``next`` targets in order.
+
+        :param this_step: Space separated path to the node
+        :type this_step: str
+        :param keys: Keys leading from the node to the value
+        :type keys: tuple
+        :param memo: Already traced sources
+        :type memo: dict
+        :return: Path of the node holding the value as its own tag or
+            None if not found
+        :rtype: str or None
+        """
+        memo_key = (this_step, keys)
+        if memo_key not in memo:
+            node = self._goto(this_step)
+            source = None
+            if keys[0] in node:
+                if len(keys) == 1:
+                    source = this_step
+                elif isinstance(node[keys[0]], dict):
+                    source = self._source(
+                        ' '.join((this_step, keys[0])), keys[1:], memo)
+            for next_step in node.get('next', []):
+                if source is not None:
+                    break
+                source = self._source(next_step, keys, memo)
+            memo[memo_key] = source
+        return memo[memo_key]
+
     def generate_palette(self, start_by):
         """ Make palette out of colors used by cards.
 
@@ -229,5 +672,55 @@ class Blueprint():
         return palette
 
 
+class Overlay(Mapping):
+    """ Read-only mapping stacked from other mappings.
+
+    A key is looked up in the given mappings in order and the first
+    value found wins (as :meth:`Blueprint._step_in` does). Values which
+    are mappings themselves are overlaid the same way. Nothing is copied,
+    so the underlying mappings can be shared.
+
+    :param mappings: Mappings, the most important first
+    :type mappings: list
+    """
+
+    def __init__(self, mappings):
+        self.mappings = tuple(mappings)
+
+    def __getitem__(self, key):
+        values = [mapping[key] for mapping in self.mappings if key in mapping]
+        if not values:
+            raise KeyError(key)
+        if not isinstance(values[0], Mapping):
+            return values[0]
+        # Plain values cannot override a mapping found earlier.
+        values = [value for value in values if isinstance(value, Mapping)]
+        return values[0] if len(values) == 1 else Overlay(values)
+
+    def __iter__(self):
+        seen = set()
+        for mapping in self.mappings:
+            for key in mapping:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return 'Overlay({!r})'.format(self.to_dict())
+
+    def to_dict(self):
+        """ Copy into plain nested dictionaries.
+
+        :rtype: dict
+        """
+        return dict(
+            (key, value.to_dict() if isinstance(value, Overlay) else value)
+            for key, value in self.items())
+
+
 if __name__ == '__main__':
-    main()
+    import sys
+    sys.exit(main())
@@ -30,18 +30,28 @@ import gimpfu
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 import toolbox  # nopep8
 import blueprint  # nopep8
+import batch  # nopep8
+import postprocess  # nopep8
 
 
 __version__ = blueprint.__version__
 __author__ = blueprint.__author__
 
 
-def card_creator(data_folder, xml_file, card_IDs, save):
+def card_creator(data_folder, xml_file, card_IDs, save, skip_errors=False,
+                 resume=False, scale=1, postprocessing='', workers=2,
+                 python='', languages='', profiles=''):
     """ Create board-game cards.
 
     Registered function by ``gimpfu.register()``. Main plugin
     functionality. Add "keepCmdOpen" among **cardIDs** to keep
-    the cmd window open.
+    the cmd window open. A card with variants stands for all of them.
+
+    Finished cards are recorded in a journal file (see
+    :class:`batch.Journal`) next to the blueprint. Cards resolving to
+    the same layout (but the image name) are assembled only once,
+    the others copy the result. Translations copy the assembled card
+    and change its texts only.
 
     :param data_folder: Blueprints (XML) and data images (XCF) folder
     :type data_folder: str
@@ -51,26 +61,264 @@ def card_creator(data_folder, xml_file, card_IDs, save):
     :type card_IDs: str
     :param save: Save the images after generation
     :type save: bool
+    :param skip_errors: Log failed cards into the journal and continue,
+        defaults to False
+    :type skip_errors: bool, optional
+    :param resume: Skip cards the journal knows as done, defaults to False
+    :type resume: bool, optional
+    :param scale: Proof scale factor, see
+        :meth:`toolbox.Toolbox.create_image`, defaults to 1 (full size)
+    :type scale: float, optional
+    :param postprocessing: Space separated post-processing tasks of saved
+        images (see :func:`postprocess.process`), defaults to "" (no PNG)
+    :type postprocessing: str, optional
+    :param workers: Number of post-processing processes, defaults to 2
+    :type workers: int, optional
+    :param python: Python (with Pillow) running the workers, defaults
+        to "" (the one running this plug-in)
+    :type python: str, optional
+    :param languages: Space separated languages to translate each card
+        into, defaults to "" (none). String tables (see
+        :meth:`blueprint.Blueprint.load_strings`) are expected next to
+        the blueprint as :file:`{blueprint name}.{language}.xml`.
+    :type languages: str, optional
+    :param profiles: Newline-separated export profiles of saved images
+        (see :meth:`toolbox.ExportProfile.parse`), defaults to "" (none)
+    :type profiles: str, optional
     :raises ValueError: If cardIDs are empty.
     """
     if not card_IDs:
         raise ValueError('No card IDs inserted!')
     data_folder = data_folder.decode('utf-8')
-    keep_cmd_open = False
+    card_IDs = card_IDs.split('\n')
+    keep_cmd_open = 'keepCmdOpen' in card_IDs
+    card_IDs = [card_ID for card_ID in card_IDs if card_ID != 'keepCmdOpen']
 
     toolbox_ = toolbox.Toolbox(data_folder, xml_file)
-    for card_ID in card_IDs.split('\n'):
-        if card_ID == 'keepCmdOpen':
-            keep_cmd_open = True
-            continue
-        toolbox_.create_image(card_ID)
-        if save:
-            toolbox_.save_image()
+    card_IDs = _expand_variants(toolbox_.blueprint, card_IDs)
+    languages = languages.split()
+    for language in languages:
+        toolbox_.blueprint.load_strings(language, '{}{}.{}.xml'.format(
+            toolbox_.data_folder, os.path.splitext(xml_file)[0], language))
+    journal = batch.Journal(
+        toolbox_.data_folder + os.path.splitext(xml_file)[0] + ' journal.txt',
+        resume)
+    if resume:
+        todo = [card_ID for card_ID in card_IDs
+                if not journal.is_done(card_ID)]
+        print('Resuming: {} cards already done.'.format(
+            len(card_IDs) - len(todo)))
+        card_IDs = todo
+
+    profiles = toolbox.ExportProfile.parse(profiles)
+    postprocessor = None
+    if save and postprocessing.split():
+        postprocessor = postprocess.PostProcessor(
+            postprocessing.split(), workers, executable=python or None)
+
+    progress = batch.Progress(len(card_IDs))
+    # dict { layout digest: [(image name, (<Gimp image>, output path))] }
+    rendered = {}
+    duplicates = 0
+    export_copies = []  # list [(export path, copy path)]
+    # Always drain the workers, even when a card raises.
+    try:
+        for card_ID in card_IDs:
+            try:
+                layouts = [toolbox_.blueprint.generate_shared_layout(
+                    card_ID, language) for language in [None] + languages]
+                digest = blueprint.layout_digest(sum(layouts, []))
+                name = toolbox.image_name(layouts[0])
+                names = [name] + [toolbox.localized_name(name, language)
+                                  for language in languages]
+                if digest in rendered:
+                    outputs = []
+                    for (source_name, (image, source_path)), new_name in zip(
+                            rendered[digest], names):
+                        outputs.append(_reuse_image(
+                            toolbox_, image, source_path, new_name, save))
+                        export_copies.extend(toolbox_.export_copies(
+                            source_name, new_name))
+                    duplicates += 1
+                else:
+                    toolbox_.create_image(card_ID, scale)
+                    outputs = [_keep_image(
+                        toolbox_, save, postprocessor, profiles)]
+                    for language in languages:
+                        toolbox_.localize_image(card_ID, language)
+                        outputs.append(_keep_image(
+                            toolbox_, save, postprocessor, profiles))
+                    rendered[digest] = list(zip(names, outputs))
+            except Exception as error:
+                if not skip_errors:
+                    raise
+                journal.record_failed(card_ID, error)
+                print('Card "{}" failed: {}'.format(card_ID, error))
+            else:
+                journal.record_done(card_ID, outputs[0][1])
+            print(progress.step())
+    finally:
+        toolbox_.font_metrics.save()
+        if postprocessor is not None:
+            print('Waiting for post-processing.')
+            for raw_path, message in postprocessor.close():
+                print('Post-processing of "{}" failed: {}'.format(
+                    raw_path, message))
+        # Exports of deduplicated cards, all written by now.
+        for source, filename in export_copies:
+            if os.path.exists(source):
+                toolbox.link_file(source, filename)
+            else:
+                print('Export "{}" missing, not copied.'.format(source))
 
+    print('Done: {} cards, failed: {} cards.'.format(
+        len(journal.done), len(journal.failed)))
+    print('Renders saved by deduplication: {}'.format(duplicates))
     if keep_cmd_open:
         raw_input('\nPress Enter to close this window!')
 
 
+def _keep_image(toolbox_, save, postprocessor, profiles):
+    """ Save the current image if asked to.
+
+    :return: Pair of the image and its path ("" if not saved)
+    :rtype: tuple
+    """
+    output_path = (toolbox_.save_image(postprocessor, profiles)
+                   if save else '')
+    return toolbox_.image, output_path
+
+
+def _reuse_image(toolbox_, image, source_path, name, save):
+    """ Output of a card whose layout has already been assembled.
+
+    Exports are copied separately, see
+    :meth:`toolbox.Toolbox.export_copies`.
+
+    :param image: The already assembled image
+    :type image: <Gimp image object>
+    :param source_path: Its path ("" if not saved)
+    :type source_path: str
+    :param name: Image name of this card
+    :type name: str
+    :return: Pair of the image and its path ("" if not saved)
+    :rtype: tuple
+    """
+    if save:
+        return image, toolbox_.copy_saved_image(source_path, name)
+    toolbox_.duplicate_image(image, name)
+    return toolbox_.image, ''
+
+
+def _expand_variants(blueprint_, card_IDs):
+    """ Replace cards having variants by all theirs virtual card IDs.
+
+    :param blueprint_: Blueprint the cards come from
+    :type blueprint_: :class:`blueprint.Blueprint`
+    :param card_IDs: Paths to starting nodes
+    :type card_IDs: list
+    :return: Card IDs
+    :rtype: list
+    """
+    expanded = []
+    for card_ID in card_IDs:
+        try:
+            expanded.extend(blueprint_.generate_variant_IDs(card_ID))
+        # Unknown card is reported when being assembled.
+        except KeyError:
+            expanded.append(card_ID)
+    return expanded
+
+
+def recolor_creator(data_folder, xml_file, card_IDs, color_IDs,
+                    postprocessing='', workers=2, python='', languages='',
+                    profiles=''):
+    """ Recolor saved cards after a color change.
+
+    Registered function by ``gimpfu.register()``. Supplemental
+    plugin functionality. Only the layers whose color comes from one
+    of the given color nodes (or from below them) are changed, see
+    :meth:`toolbox.Toolbox.recolor_image`.
+
+    :param data_folder: Blueprints (XML) and data images (XCF) folder
+    :type data_folder: str
+    :param xml_file: Blueprint to be used (with extension)
+    :type xml_file: str
+    :param card_IDs: Newline-separated paths to starting nodes.
+    :type card_IDs: str
+    :param color_IDs: Newline-separated paths to the changed color nodes.
+    :type color_IDs: str
+    :param postprocessing: Post-processing tasks of the PNG exports, see
+        :func:`card_creator`. Give the same as the original run, the PNG
+        exports are written again. Defaults to "" (no PNG)
+    :type postprocessing: str, optional
+    :param workers: Number of post-processing processes, defaults to 2
+    :type workers: int, optional
+    :param python: Python (with Pillow) running the workers, defaults
+        to "" (the one running this plug-in)
+    :type python: str, optional
+    :param languages: Space separated languages of the saved
+        translations, defaults to "" (none)
+    :type languages: str, optional
+    :param profiles: Newline-separated export profiles to be exported
+        again (see :meth:`toolbox.ExportProfile.parse`), defaults to ""
+    :type profiles: str, optional
+    :raises ValueError: If cardIDs or colorIDs are empty.
+    """
+    if not card_IDs or not color_IDs.split():
+        raise ValueError('No card IDs or color IDs inserted!')
+    data_folder = data_folder.decode('utf-8')
+    color_IDs = [color_ID.strip() for color_ID in color_IDs.split('\n')
+                 if color_ID.strip()]
+
+    toolbox_ = toolbox.Toolbox(data_folder, xml_file)
+    card_IDs = _expand_variants(toolbox_.blueprint, card_IDs.split('\n'))
+    languages = languages.split()
+    for language in languages:
+        toolbox_.blueprint.load_strings(language, '{}{}.{}.xml'.format(
+            toolbox_.data_folder, os.path.splitext(xml_file)[0], language))
+    profiles = toolbox.ExportProfile.parse(profiles)
+    postprocessor = None
+    if postprocessing.split():
+        postprocessor = postprocess.PostProcessor(
+            postprocessing.split(), workers, executable=python or None)
+
+    affected = {}  # dict { card ID: [layer name] }
+    for source, layers in toolbox_.blueprint.color_index(card_IDs).items():
+        if source is None or not any(
+                source == color_ID or source.startswith(color_ID + ' ')
+                for color_ID in color_IDs):
+            continue
+        for card_ID, layer_name in layers:
+            affected.setdefault(card_ID, []).append(layer_name)
+
+    progress = batch.Progress(len(affected))
+    failed = 0
+    try:
+        for card_ID in card_IDs:
+            if card_ID not in affected:
+                continue
+            for language in [None] + languages:
+                try:
+                    toolbox_.recolor_image(
+                        card_ID, affected[card_ID], language, profiles,
+                        postprocessor)
+                except (IOError, KeyError) as error:
+                    failed += 1
+                    print('Card "{}" failed: {}'.format(card_ID, error))
+            print(progress.step())
+    finally:
+        if postprocessor is not None:
+            print('Waiting for post-processing.')
+            for raw_path, message in postprocessor.close():
+                print('Post-processing of "{}" failed: {}'.format(
+                    raw_path, message))
+    print('Done: {} cards recolored, failed: {} images.'.format(
+        len(affected), failed))
+    if not profiles and postprocessor is None:
+        print('Exports were not written again, theirs colors are old.')
+
+
 def palette_creator(data_folder, xml_file, palette_ID, name):
     """ Create palette.
 
@@ -116,6 +364,32 @@ gimpfu.register(
     menu='<Image>/Card Assembler'
 )
 
+gimpfu.register(
+    proc_name='CA_recolor',  # Used in Procedure browser.
+    blurb='Recolor saved cards.' + ' ' * 45,  # Widget title.
+    help='Recolor saved cards after a color change.',
+    author='Martin Brajer',
+    copyright='Martin Brajer',
+    date='October 2026',  # Copyright date.
+    label='Recolor',  # Menu entry.
+    imagetypes='',  # No image required (imagetypes).
+    params=[
+        (gimpfu.PF_DIRNAME, 'dataFolder', 'Data folder:',
+            os.path.expanduser('~')),
+        (gimpfu.PF_STRING, 'xmlFile', 'XML file:', 'Blueprint.xml'),
+        (gimpfu.PF_TEXT, 'cardIDs', 'Card IDs:', ''),
+        (gimpfu.PF_TEXT, 'colorIDs', 'Color IDs:', 'color'),
+        (gimpfu.PF_STRING, 'postprocessing', 'PNG post-processing:', ''),
+        (gimpfu.PF_INT, 'workers', 'Post-processing workers:', 2),
+        (gimpfu.PF_FILE, 'python', 'Post-processing Python:', ''),
+        (gimpfu.PF_STRING, 'languages', 'Languages:', ''),
+        (gimpfu.PF_TEXT, 'profiles', 'Export profiles:', ''),
+    ],
+    results=[],
+    function=recolor_creator,
+    menu='<Image>/Card Assembler'
+)
+
 gimpfu.register(
     proc_name='CA_card_assembler',  # Used in Procedure browser.
     blurb='Create board-game cards.' + ' ' * 40,  # Widget title.
@@ -131,10 +405,19 @@ gimpfu.register(
         (gimpfu.PF_STRING, 'xmlFile', 'XML file:', 'Blueprint.xml'),
         (gimpfu.PF_TEXT, 'cardIDs', 'Card IDs:', ''),
         (gimpfu.PF_BOOL, 'save', 'Save:', False),
+        (gimpfu.PF_BOOL, 'skipErrors', 'Skip failed cards:', False),
+        (gimpfu.PF_BOOL, 'resume', 'Resume:', False),
+        (gimpfu.PF_FLOAT, 'scale', 'Proof scale:', 1.0),
+        (gimpfu.PF_STRING, 'postprocessing', 'PNG post-processing:', ''),
+        (gimpfu.PF_INT, 'workers', 'Post-processing workers:', 2),
+        (gimpfu.PF_FILE, 'python', 'Post-processing Python:', ''),
+        (gimpfu.PF_STRING, 'languages', 'Languages:', ''),
+        (gimpfu.PF_TEXT, 'profiles', 'Export profiles:', ''),
     ],
     results=[],
     function=card_creator,
     menu='<Image>/Card Assembler'
 )
 
-gimpfu.main()
+if __name__ == '__main__':
+    gimpfu.main()
@@ -7,6 +7,7 @@ Only members meant to be referenced in the main scope.
 
 
 class Gimpfu():
-    PF_DIRNAME = PF_STRING = PF_TEXT = PF_BOOL = None
+    PF_DIRNAME = PF_STRING = PF_TEXT = PF_BOOL = PF_FLOAT = PF_INT = None
+    PF_FILE = None
     def register(self, **kwargs): pass
     def main(self): pass
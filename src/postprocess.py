@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Supplemental script which handles export post-processing without Gimp.
+
+Gimp writes a raw (uncompressed) PNG of each card. Compression, color
+profile conversion and thumbnails are then done by a bounded pool of
+worker processes, so Gimp can assemble the next card meanwhile.
+
+Each worker is this script run by a separate interpreter, which never
+imports Gimp's modules::
+
+    python postprocess.py optimize thumbnail:256
+
+It reads raw export paths from its standard input, one per line, and
+answers each by a line of the path and the error message (empty on
+success) separated by a tab.
+
+Post-processing uses `Pillow <https://python-pillow.org/>`_, which has
+to be installed for the Python running the workers.
+"""
+
+
+__all__ = ['PostProcessor', 'process', 'output_paths']
+# Needs :class:`blueprint`. See below.
+__version__ = None
+__author__ = None
+
+
+import collections
+import os
+import subprocess
+import sys
+
+try:
+    from PIL import Image, ImageCms
+except ImportError:
+    Image = ImageCms = None
+
+# Same folder as this script.
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import blueprint  # nopep8
+
+
+__version__ = blueprint.__version__
+__author__ = blueprint.__author__
+
+
+#: Raw export file ending. Replaced by ".png" once post-processed.
+RAW_SUFFIX = '.raw.png'
+
+#: Known tasks. Arguments follow a colon, e.g. "thumbnail:256".
+TASKS = ['optimize', 'profile', 'thumbnail']
+
+
+def output_paths(raw_path, tasks):
+    """ Files :func:`process` writes for the given raw export.
+
+    :param raw_path: Raw export, its name ending by :data:`RAW_SUFFIX`
+    :type raw_path: str
+    :param tasks: Tasks, see :func:`process`
+    :type tasks: list
+    :return: Compressed PNG, then the thumbnail if any
+    :rtype: list
+    """
+    stem = raw_path[:-len(RAW_SUFFIX)]
+    paths = [stem + '.png']
+    if any(task.partition(':')[0] == 'thumbnail' for task in tasks):
+        paths.append(stem + ' thumbnail.png')
+    return paths
+
+
+def process(raw_path, tasks):
+    """ Post-process one raw export. Run by the workers.
+
+    Always writes the compressed :file:`{name}.png` and removes the raw
+    file. Tasks are applied in the given order:
+
+    * ``profile:{ICC file}`` convert colors from sRGB to the given profile
+    * ``optimize`` spend more time to make the PNG smaller
+    * ``thumbnail:{size}`` also write :file:`{name} thumbnail.png` fitting
+      into a square of the given size (defaults to 256 px)
+
+    :param raw_path: Raw export, its name ending by :data:`RAW_SUFFIX`
+    :type raw_path: str
+    :param tasks: Tasks, see above
+    :type tasks: list
+    :raises RuntimeError: If Pillow is not installed
+    :return: Written files
+    :rtype: list
+    """
+    if Image is None:
+        raise RuntimeError('Post-processing needs Pillow installed.')
+    stem = raw_path[:-len(RAW_SUFFIX)]
+    image = Image.open(raw_path)
+    image.load()
+
+    optimize = False
+    outputs = []
+    for task in tasks:
+        name, _, argument = task.partition(':')
+        if name == 'profile':
+            image = ImageCms.profileToProfile(
+                image, ImageCms.createProfile('sRGB'), argument,
+                outputMode=image.mode)
+        elif name == 'optimize':
+            optimize = True
+        elif name == 'thumbnail':
+            size = int(argument) if argument else 256
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size), Image.LANCZOS)
+            outputs.append(stem + ' thumbnail.png')
+            thumbnail.save(outputs[-1])
+
+    outputs.insert(0, stem + '.png')
+    options = {'optimize': optimize}
+    if 'dpi' in image.info:
+        options['dpi'] = image.info['dpi']
+    image.save(outputs[0], **options)
+    os.remove(raw_path)
+    return outputs
+
+
+def _process_safely(raw_path, tasks):
+    """ Run :func:`process`, return the error instead of raising it.
+
+    A worker (see :func:`main`) reports the error back and goes on with
+    the next export, so does :class:`PostProcessor` without workers.
+
+    :return: Pair of raw path and error message (None on success)
+    :rtype: tuple
+    """
+    try:
+        process(raw_path, tasks)
+    except Exception as error:
+        return raw_path, '{}: {}'.format(type(error).__name__, error)
+    return raw_path, None
+
+
+def _binary(stream):
+    """ Byte stream of a standard stream (Python 2 has no buffer). """
+    return getattr(stream, 'buffer', stream)
+
+
+def _encode(text):
+    """ One protocol line, see the module description.
+
+    :rtype: bytes
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    return u' '.join(text.splitlines()).encode('utf-8') + b'\n'
+
+
+def main(argv=None):
+    """ Run a worker: post-process raw exports read from standard input.
+
+    :param argv: Tasks, see :func:`process`, defaults to :data:`sys.argv`
+    :type argv: list or None, optional
+    :return: Exit code
+    :rtype: int
+    """
+    tasks = sys.argv[1:] if argv is None else argv
+    stdin, stdout = _binary(sys.stdin), _binary(sys.stdout)
+    for line in iter(stdin.readline, b''):
+        raw_path = line.rstrip(b'\r\n').decode('utf-8')
+        raw_path, message = _process_safely(raw_path, tasks)
+        stdout.write(_encode(u'{}\t{}'.format(raw_path, message or u'')))
+        stdout.flush()
+    return 0
+
+
+class PostProcessor():
+    """ Bounded pool of post-processing workers.
+
+    At most **max_pending** raw exports wait for (or undergo)
+    post-processing. Submitting another one blocks until a worker
+    finishes, so the queue cannot outgrow the workers.
+
+    Workers are separate interpreters running this script (see
+    :func:`main`), not forks or spawns of Gimp's plug-in process.
+
+    :param tasks: Tasks applied to each export, see :func:`process`
+    :type tasks: list
+    :param processes: Number of workers, defaults to 2. Zero processes
+        everything right away in the calling process.
+    :type processes: int, optional
+    :param max_pending: Queue limit, defaults to twice the **processes**
+    :type max_pending: int or None, optional
+    :param executable: Python of the workers, defaults to
+        :data:`sys.executable`
+    :type executable: str or None, optional
+    :raises ValueError: If a task is unknown
+    """
+
+    def __init__(self, tasks, processes=2, max_pending=None,
+                 executable=None):
+        for task in tasks:
+            if task.partition(':')[0] not in TASKS:
+                raise ValueError('Unknown post-processing task "{}".'.format(
+                    task))
+        self.tasks = list(tasks)
+        self.errors = []  # list [(raw path, error message)]
+        self.workers = []
+        self.pending = collections.deque()  # [(raw path, worker)]
+        self.max_pending = max_pending or 2 * processes
+        script = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+        for _ in range(processes):
+            self.workers.append(subprocess.Popen(
+                [executable or sys.executable, script] + self.tasks,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE))
+
+    def submit(self, raw_path):
+        """ Post-process the given raw export.
+
+        :param raw_path: Raw export, its name ending by :data:`RAW_SUFFIX`
+        :type raw_path: str
+        """
+        if not self.workers:
+            self._done(_process_safely(raw_path, self.tasks))
+            return
+        while len(self.pending) >= self.max_pending:
+            self._finished()
+        # The least busy worker.
+        busy = collections.Counter(worker for _, worker in self.pending)
+        worker = min(self.workers, key=lambda worker_: busy[worker_])
+        worker.stdin.write(_encode(raw_path))
+        worker.stdin.flush()
+        self.pending.append((raw_path, worker))
+
+    def _finished(self):
+        """ Wait for the oldest pending export. Free its place.
+
+        A worker answers in the order of its submissions.
+        """
+        raw_path, worker = self.pending.popleft()
+        line = worker.stdout.readline()
+        if not line:
+            self._done((raw_path, 'Post-processing worker exited.'))
+            return
+        message = line.rstrip(b'\r\n').decode('utf-8').partition(u'\t')[2]
+        self._done((raw_path, message or None))
+
+    def _done(self, result):
+        """ Note an error, if any. """
+        if result[1] is not None:
+            self.errors.append(result)
+
+    def close(self):
+        """ Wait for all the submitted exports to be post-processed.
+
+        :return: Pairs of raw path and error message of failed exports
+        :rtype: list
+        """
+        while self.pending:
+            self._finished()
+        for worker in self.workers:
+            worker.stdin.close()
+            worker.wait()
+            worker.stdout.close()
+        self.workers = []
+        return self.errors
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,15 +7,24 @@ Testing of both scripts: :mod:`cardassembler` and :mod:`blueprint`.
 """
 
 
+import io
+import json
 import os
 import re
+import shutil
 import sys
+import tempfile
 import unittest
 
 import xml.etree.ElementTree as ET
+from contextlib import redirect_stderr, redirect_stdout
 import pycodestyle
 
+import analyzer
+import batch
 import blueprint
+import postprocess
+import textfit
 # Bypass internal Gimp's python gimpfu package imported
 # by :mod:`cardassembler`.
 from my_mock import Gimpfu as Mock_Gimpfu
@@ -34,6 +43,10 @@ class TestCodeFormat(unittest.TestCase):
             path + '\\blueprint.py',
             path + '\\cardassembler.py',
             path + '\\toolbox.py',
+            path + '\\batch.py',
+            path + '\\analyzer.py',
+            path + '\\postprocess.py',
+            path + '\\textfit.py',
         ])
         self.assertEqual(result.total_errors, 0,
                          "Found code style errors (and warnings).")
@@ -56,10 +69,18 @@ class TestCodeFormat(unittest.TestCase):
     def test_version_equal(self):
         self.assertEqual(cardassembler.__version__, blueprint.__version__)
         self.assertEqual(toolbox.__version__, blueprint.__version__)
+        self.assertEqual(batch.__version__, blueprint.__version__)
+        self.assertEqual(analyzer.__version__, blueprint.__version__)
+        self.assertEqual(postprocess.__version__, blueprint.__version__)
+        self.assertEqual(textfit.__version__, blueprint.__version__)
 
     def test_author_equal(self):
         self.assertEqual(cardassembler.__author__, blueprint.__author__)
         self.assertEqual(toolbox.__author__, blueprint.__author__)
+        self.assertEqual(batch.__author__, blueprint.__author__)
+        self.assertEqual(analyzer.__author__, blueprint.__author__)
+        self.assertEqual(postprocess.__author__, blueprint.__author__)
+        self.assertEqual(textfit.__author__, blueprint.__author__)
 
 
 class TestBlueprintMethods(unittest.TestCase):
@@ -108,5 +129,606 @@ class TestBlueprintMethods(unittest.TestCase):
             self.DICT['card']['command01_image'])
 
 
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'Blueprint.xml')
+        with open(self.path, 'w') as file_:
+            file_.write(
+                '<data><card><command01_image><layer_type>image</layer_type>'
+                '<size parse="tuple">800, 500</size></command01_image>'
+                '<command02_background><next>color white</next>'
+                '</command02_background></card>'
+                '<color><white><color>#ffffff</color></white></color></data>')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def run_main(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            exit_code = blueprint.main([self.path] + list(argv))
+        return exit_code, output.getvalue()
+
+    def test_layout(self):
+        exit_code, output = self.run_main('layout', 'card')
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(json.loads(output), {
+            'command01_image': {'layer_type': 'image', 'size': [800, 500]},
+            'command02_background': {'color': '#ffffff'},
+        })
+
+    def test_list(self):
+        self.assertEqual(self.run_main('list', 'ca'), (0, 'card\n'))
+        self.assertEqual(self.run_main('list', 'x'), (0, ''))
+
+    def test_list_referenced_card(self):
+        self.path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), '..', 'examples',
+            'Blueprint using a template.xml')
+        self.assertEqual(self.run_main('list', 'unique')[1].splitlines(), [
+            'unique spell soothingWinds', 'unique spell theSameSpellButBlue'])
+
+    def test_time(self):
+        exit_code, output = self.run_main('time', '--shared', 'card')
+        lines = output.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith('ms  card'))
+
+    def test_palette(self):
+        exit_code, output = self.run_main('palette', '--name', 'Test')
+        self.assertEqual(output.splitlines(), [
+            'GIMP Palette', 'Name: Test', 'Columns: 1', '#',
+            '255 255 255\twhite'])
+
+    def test_check(self):
+        exit_code, output = self.run_main('check')
+        self.assertEqual(exit_code, 1)
+        self.assertIn('command02_background', output)
+
+    def test_errors(self):
+        def run_failing(*argv):
+            error = io.StringIO()
+            with redirect_stderr(error):
+                exit_code, output = self.run_main(*argv)
+            self.assertEqual(exit_code, blueprint.ERROR_EXIT_CODE)
+            self.assertEqual(output, '')
+            self.assertEqual(len(error.getvalue().splitlines()), 1)
+            return error.getvalue()
+
+        self.assertIn('keyword "example" was not found',
+                      run_failing('layout', 'card example'))
+        with open(self.path, 'w') as file_:
+            file_.write('<data><card></data>')
+        self.assertIn('mismatched tag', run_failing('list', 'card'))
+        self.path = os.path.join(self.folder, 'Missing.xml')
+        self.assertIn('Missing.xml', run_failing('check'))
+
+
+class TestLayoutMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.blueprint = blueprint.Blueprint(None)
+        self.blueprint.data = {
+            'card1': {
+                'next': ['template layout'],
+                'command02_text': {'text': ['First', 'card']},
+            },
+            'card2': {
+                'next': ['template layout', 'template extra'],
+                'command01_image': {'name': 'Second'},
+            },
+            'template': {
+                'layout': {
+                    'command01_image': {
+                        'next': ['template size'],
+                        'layer_type': 'image',
+                        'name': 'Card',
+                    },
+                    'command02_text': {
+                        'layer_type': 'text', 'text': ['Template']},
+                },
+                'extra': {
+                    'command02_text': {'font': 'Arial', 'text': ['Extra']},
+                    'command03_hide': {'layer_type': 'hide'},
+                },
+                'size': {'size': (800, 500)},
+            },
+        }
+
+    def test_generate_layout(self):
+        self.assertEqual(self.blueprint.generate_layout('card2'), [
+            ('command01_image', {
+                'layer_type': 'image', 'name': 'Second', 'size': (800, 500)}),
+            ('command02_text', {
+                'layer_type': 'text', 'text': 'Template', 'font': 'Arial'}),
+            ('command03_hide', {'layer_type': 'hide'}),
+        ])
+
+    def test_shared_layout_equal(self):
+        for card_ID in ('card1', 'card2', 'template layout'):
+            self.assertEqual(
+                self.blueprint.generate_shared_layout(card_ID),
+                self.blueprint.generate_layout(card_ID))
+
+    def test_shared_layout_shares(self):
+        layers1 = dict(self.blueprint.generate_shared_layout('card1'))
+        layers2 = dict(self.blueprint.generate_shared_layout('card2'))
+        shared = self.blueprint._resolve('template layout command01_image')
+        self.assertIs(layers1['command01_image'], shared)
+        self.assertIs(layers2['command01_image'].mappings[1], shared)
+
+    def test_variants(self):
+        self.blueprint.data['card1']['variants'] = {
+            'rarity': {
+                'rare': {'command01_image': {'name': 'Rare'}},
+                'common': {},
+            },
+            'element': {
+                'fire': {'command02_text': {'color': '#ff0000'}},
+            },
+        }
+        self.assertEqual(list(self.blueprint.generate_variant_IDs('card1')), [
+            'card1 fire common', 'card1 fire rare'])
+        self.assertEqual(list(self.blueprint.generate_variant_IDs('card2')), [
+            'card2'])
+        layout = dict(self.blueprint.generate_layout('card1 fire rare'))
+        self.assertEqual(layout['command01_image']['name'], 'Rare (fire)')
+        self.assertEqual(layout['command02_text'], {
+            'layer_type': 'text', 'text': 'First\ncard', 'color': '#ff0000'})
+        self.assertEqual(
+            self.blueprint.generate_shared_layout('card1 fire rare'),
+            self.blueprint.generate_layout('card1 fire rare'))
+        self.assertNotIn('card1 fire rare', self.blueprint.data['card1'])
+        self.assertNotIn('variants', dict(
+            self.blueprint.generate_layout('card1')))
+        with self.assertRaises(KeyError):
+            self.blueprint.generate_layout('card1 fire epic')
+        with self.assertRaises(KeyError):
+            self.blueprint.generate_layout('card1 fire')
+
+    def test_variant_image_names(self):
+        self.blueprint.data['card1']['variants'] = {
+            'element': {
+                'fire': {'command01_image': {'name': 'Fire'}},
+                'water': {'command01_image': {'name': 'Water'}},
+            },
+            'rarity': {
+                'common': {},
+                'rare': {'command01_image': {'name': 'Rare'}},
+                'epic': {},
+            },
+        }
+        names = []
+        for card_ID in self.blueprint.generate_variant_IDs('card1'):
+            for generate in (self.blueprint.generate_layout,
+                             self.blueprint.generate_shared_layout):
+                layers = dict(generate(card_ID))
+                self.assertEqual(layers['command01_image']['layer_type'],
+                                 'image')
+            names.append(layers['command01_image']['name'])
+        self.assertEqual(names[:3], [
+            'Fire (common)', 'Fire (epic)', 'Fire (rare)'])
+        self.assertEqual(len(set(names)), 6)
+
+        del self.blueprint.data['card1']['variants']['element']
+        self.assertEqual(dict(self.blueprint.generate_layout('card1 epic'))[
+            'command01_image']['name'], 'Card (epic)')
+
+    def test_layout_digest(self):
+        self.blueprint.data['card3'] = {'next': ['card1']}
+        self.blueprint.data['card3']['command01_image'] = {'name': 'Third'}
+        digests = [
+            blueprint.layout_digest(self.blueprint.generate_layout(card_ID))
+            for card_ID in ('card1', 'card2', 'card3')]
+        self.assertNotEqual(digests[0], digests[1])
+        self.assertEqual(digests[0], digests[2])
+        self.assertEqual(digests[0], blueprint.layout_digest(
+            self.blueprint.generate_shared_layout('card1')))
+
+    def test_translation(self):
+        self.blueprint.strings['cs'] = {
+            'card1': {'command02_text': {'text': ['Prvn\u00ed', 'karta']}},
+            'template': {'extra': {
+                'command02_text': {'text': ['Nav\u00edc']}}},
+        }
+        for generate in (self.blueprint.generate_layout,
+                         self.blueprint.generate_shared_layout):
+            layers = dict(generate('card1', 'cs'))
+            self.assertEqual(layers['command02_text']['text'],
+                             'Prvn\u00ed\nkarta')
+            layers = dict(generate('card2', 'cs'))
+            self.assertEqual(layers['command02_text']['text'], 'Template')
+            self.assertEqual(layers['command01_image']['name'], 'Second')
+            layers = dict(generate('card1'))
+            self.assertEqual(layers['command02_text']['text'], 'First\ncard')
+
+    def test_translation_reloaded(self):
+        folder = tempfile.mkdtemp()
+        file_path = os.path.join(folder, 'strings.xml')
+        try:
+            for text in ('Jedna', 'Prvn\u00ed'):
+                with io.open(file_path, 'w', encoding='utf-8') as file_:
+                    file_.write(u'<root><card1><command02_text><text>{}'
+                                u'</text></command02_text></card1>'
+                                u'</root>'.format(text))
+                self.blueprint.load_strings('cs', file_path)
+                layers = dict(
+                    self.blueprint.generate_shared_layout('card1', 'cs'))
+                self.assertEqual(layers['command02_text']['text'], text)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_shared_layout_as_kwargs(self):
+        def layer_text(text, **kwargs):
+            return text, sorted(kwargs)
+        layer = dict(self.blueprint.generate_shared_layout('card1'))[
+            'command02_text']
+        self.assertEqual(layer_text(**layer), ('First\ncard', ['layer_type']))
+
+    def test_color_index(self):
+        self.blueprint.data['color'] = {
+            'red': {'color': '#ff0000'}, 'blue': {'color': '#0000ff'}}
+        self.blueprint.data['template']['extra']['command02_text'][
+            'next'] = ['color red']
+        self.blueprint.data['card1']['command02_text']['next'] = [
+            'color blue']
+        self.blueprint.data['card2']['command04_own'] = {
+            'layer_type': 'monochrome', 'color': '#00ff00'}
+        # Hidden, nothing to recolor.
+        self.blueprint.data['template']['layout']['command03_stripe'] = {
+            'layer_type': 'monochrome', 'next': ['color red']}
+        self.blueprint.data['card1']['command03_stripe'] = {
+            'layer_type': 'hide'}
+        self.assertEqual(self.blueprint.color_index(['card1', 'card2']), {
+            'color blue': [('card1', 'command02_text')],
+            'color red': [('card2', 'command02_text'),
+                          ('card2', 'command03_stripe')],
+            'card2 command04_own': [('card2', 'command04_own')],
+        })
+
+
+class TestToolboxFunctions(unittest.TestCase):
+
+    def test_scale_layer(self):
+        layer = {'layer_type': 'text', 'size': (350, 3), 'font_size': 20,
+                 'position': (100, 201), 'letter_spacing': -1.4}
+        scaled = toolbox.scale_layer(layer, 0.25)
+        self.assertEqual(scaled['size'], (88, 1))
+        self.assertEqual(scaled['position'], (25, 50))
+        self.assertAlmostEqual(scaled['font_size'], 5)
+        self.assertAlmostEqual(scaled['letter_spacing'], -0.35)
+        self.assertEqual(scaled['layer_type'], 'text')
+        self.assertNotIn('line_spacing', scaled)
+        self.assertEqual(layer['size'], (350, 3))
+
+    def test_image_name(self):
+        self.assertEqual(toolbox.image_name([
+            ('command01_image', {'layer_type': 'image', 'name': 'Card'}),
+            ('command02_text', {'layer_type': 'text', 'name': 'Text'}),
+        ]), 'Card')
+        self.assertEqual(toolbox.image_name([
+            ('command01_image', {'layer_type': 'image'})]),
+            toolbox.DEFAULT_IMAGE_NAME)
+
+    def test_selection_rectangle(self):
+        toolbox_ = toolbox.Toolbox.__new__(toolbox.Toolbox)
+        toolbox_.selections = {}
+        toolbox_.image_size = (800, 500)
+        self.assertEqual(toolbox_._selection_rectangle(10, 60, 0, 50),
+                         (80, 0, 400, 250))
+        self.assertEqual(len(toolbox_.selections), 1)
+        toolbox_.image_size = (400, 250)
+        self.assertEqual(toolbox_._selection_rectangle(10, 60, 0, 50),
+                         (40, 0, 200, 125))
+        self.assertEqual(len(toolbox_.selections), 2)
+        with self.assertRaises(ArithmeticError):
+            toolbox_._selection_rectangle(60, 10, 0, 50)
+
+    def test_proof_cache_name(self):
+        self.assertEqual(toolbox._proof_cache_name('Corner.xcf', 0.25),
+                         '0.25x Corner.xcf')
+        self.assertEqual(
+            toolbox._proof_cache_name('frames\\gold/Corner.png', 0.5),
+            '0.5x frames%5Cgold%2FCorner.xcf')
+        self.assertNotEqual(toolbox._proof_cache_name('a/b%2Fc.xcf', 0.5),
+                            toolbox._proof_cache_name('a%2Fb/c.xcf', 0.5))
+
+    def test_export_copies(self):
+        folder = tempfile.mkdtemp()
+        try:
+            toolbox_ = toolbox.Toolbox.__new__(toolbox.Toolbox)
+            toolbox_.data_folder = folder + '/'
+            toolbox_.save_directory = 'Saved images/'
+            toolbox_.scale = 1
+            source = toolbox_._save_path('Bolt', ' web.jpg')
+            toolbox_.exports = {'Bolt': [source]}
+            copies = toolbox_.export_copies('Bolt', 'Blue bolt')
+            self.assertEqual(copies, [
+                (source, toolbox_._save_path('Blue bolt', ' web.jpg'))])
+            with open(source, 'w') as file_:
+                file_.write('exported')
+            toolbox.link_file(*copies[0])
+            with open(copies[0][1]) as file_:
+                self.assertEqual(file_.read(), 'exported')
+
+            # Recolored export, the linked copy keeps its colors.
+            toolbox._unlink_shared(source)
+            with open(source, 'w') as file_:
+                file_.write('recolored')
+            with open(copies[0][1]) as file_:
+                self.assertEqual(file_.read(), 'exported')
+            toolbox._unlink_shared(source)
+            self.assertTrue(os.path.exists(source))
+        finally:
+            shutil.rmtree(folder)
+
+    def test_export_profiles(self):
+        print_, web = toolbox.ExportProfile.parse(
+            'print: format=TIF dpi=300\n\nweb: size=1200 resampling=lohalo')
+        self.assertEqual((print_.name, print_.file_format, print_.dpi),
+                         ('print', 'tif', 300))
+        self.assertEqual(print_.scaled_size(750, 1050), (750, 1050))
+        self.assertEqual((web.name, web.file_format, web.resampling),
+                         ('web', 'png', 'lohalo'))
+        self.assertEqual(web.scaled_size(750, 1050), (857, 1200))
+        self.assertEqual(toolbox.ExportProfile.parse(''), [])
+        for text in ('web size=1200', 'web: size', 'web: color=red',
+                     'web: resampling=sharp'):
+            with self.assertRaises(ValueError):
+                toolbox.ExportProfile.parse(text)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'journal.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_journal_resume(self):
+        journal = batch.Journal(self.path)
+        journal.record_done('card a', 'a.xcf')
+        journal.record_failed('card b', KeyError('next\nmissing'))
+        journal = batch.Journal(self.path, resume=True)
+        self.assertTrue(journal.is_done('card a'))
+        self.assertFalse(journal.is_done('card b'))
+        self.assertEqual(journal.done, {'card a': 'a.xcf'})
+        self.assertEqual(list(journal.failed), ['card b'])
+
+    def test_journal_failed_then_done(self):
+        journal = batch.Journal(self.path)
+        journal.record_failed('card a', ValueError('typo'))
+        journal.record_done('card a')
+        journal = batch.Journal(self.path, resume=True)
+        self.assertTrue(journal.is_done('card a'))
+        self.assertEqual(journal.failed, {})
+
+    def test_journal_restart(self):
+        batch.Journal(self.path).record_done('card a')
+        self.assertFalse(batch.Journal(self.path).is_done('card a'))
+
+    def test_progress(self):
+        now = [0.0]
+        progress = batch.Progress(10, clock=lambda: now[0])
+        self.assertEqual(progress.report(), '[0/10] 0.00 cards/s, ETA ?')
+        now[0] = 4.0
+        progress.step()
+        progress.step()
+        self.assertAlmostEqual(progress.rate(), 0.5)
+        self.assertAlmostEqual(progress.eta(), 16)
+        self.assertEqual(progress.report(), '[2/10] 0.50 cards/s, ETA 0:00:16')
+
+
+class TestAnalyzer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.blueprint = blueprint.Blueprint(None)
+        cls.blueprint.data = {
+            'card': {
+                'next': ['template layout'],
+                'command01_image': {'size': (800, 500)},
+                'command02_text': {'next': ['template missing']},
+            },
+            'loop': {
+                'command01_image': {'next': ['loop']},
+            },
+            'template': {
+                'layout': {
+                    'command01_image': {
+                        'next': ['template image'], 'name': 'Card'},
+                },
+                'image': {'layer_type': 'image'},
+                'unused': {'layer_type': 'hide'},
+            },
+        }
+        cls.report = analyzer.Analyzer(cls.blueprint).analyze(
+            ['card', 'loop'])
+
+    def test_infer_cards(self):
+        self.assertEqual(
+            analyzer.Analyzer(self.blueprint).infer_cards(), ['card', 'loop'])
+
+    def test_infer_cards_referenced(self):
+        blueprint_ = blueprint.Blueprint(None)
+        blueprint_.data = {
+            'unique': {
+                'bolt': {'next': ['template layout'], 'layer': {}},
+                'blue_bolt': {'next': ['unique bolt'], 'layer': {}},
+            },
+            'template': {
+                'layout': {'layer': {'layer_type': 'hide'}},
+                'never': {'layer': {'layer_type': 'hide'}},
+            },
+        }
+        analyzer_ = analyzer.Analyzer(blueprint_)
+        self.assertEqual(analyzer_.infer_cards(), [
+            'unique blue_bolt', 'unique bolt'])
+        self.assertEqual(analyzer_.analyze()['unreached_templates'], [
+            'template never'])
+
+    def test_dangling(self):
+        self.assertEqual(self.report['dangling'], [
+            ('card command02_text', 'template missing')])
+
+    def test_next_to_variant(self):
+        blueprint_ = blueprint.Blueprint(None)
+        blueprint_.data = {'spell': {
+            'bolt': {
+                'variants': {'element': {'fire': {'layer': {'color': 'r'}}}},
+                'layer': {'layer_type': 'monochrome'},
+            },
+            'fire_bolt': {'next': ['spell bolt fire']},
+            'broken': {'next': ['spell bolt water', 'spell bolt fire x']},
+        }}
+        report = analyzer.Analyzer(blueprint_).analyze()
+        self.assertEqual(report['cards'], [
+            'spell bolt', 'spell broken', 'spell fire_bolt'])
+        self.assertEqual(report['dangling'], [
+            ('spell broken', 'spell bolt fire x'),
+            ('spell broken', 'spell bolt water')])
+        self.assertEqual(report['missing_layer_type'], [])
+
+    def test_cycles(self):
+        self.assertEqual(self.report['cycles'], [
+            ['loop', 'loop command01_image', 'loop']])
+
+    def test_unreached_templates(self):
+        self.assertEqual(self.report['unreached_templates'], [
+            'template unused'])
+        report = analyzer.Analyzer(self.blueprint).analyze(['loop'])
+        self.assertEqual(report['unreached_templates'], ['template'])
+
+    def test_deepest_chains(self):
+        self.assertEqual(self.report['deepest_chains'][0], (
+            2, ['card', 'template layout', 'template image']))
+
+    def test_missing_layer_type(self):
+        self.assertEqual(self.report['missing_layer_type'], [
+            ('card', 'command02_text'), ('loop', 'command01_image')])
+        self.assertTrue(analyzer.Analyzer.has_errors(self.report))
+
+
+class TestPostProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.raw_path = os.path.join(
+            self.folder, 'card' + postprocess.RAW_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_output_paths(self):
+        self.assertEqual(
+            postprocess.output_paths('a b.raw.png', ['thumbnail:64']),
+            ['a b.png', 'a b thumbnail.png'])
+        self.assertEqual(postprocess.output_paths('c.raw.png', []),
+                         ['c.png'])
+
+    def test_unknown_task(self):
+        with self.assertRaises(ValueError):
+            postprocess.PostProcessor(['optimise'], processes=0)
+
+    @unittest.skipIf(postprocess.Image is not None, 'Pillow installed.')
+    def test_errors_collected(self):
+        for processes in (0, 1):
+            postprocessor = postprocess.PostProcessor(
+                ['optimize'], processes, max_pending=1)
+            postprocessor.submit(self.raw_path)
+            postprocessor.submit(self.raw_path)
+            errors = postprocessor.close()
+            self.assertEqual(len(errors), 2)
+            self.assertEqual(errors[0][0], self.raw_path)
+            self.assertIn('RuntimeError', errors[0][1])
+
+    @unittest.skipIf(postprocess.Image is None, 'Pillow not installed.')
+    def test_process(self):
+        postprocess.Image.new('RGB', (800, 500)).save(
+            self.raw_path, compress_level=0)
+        postprocessor = postprocess.PostProcessor(
+            ['optimize', 'thumbnail:100'], processes=1)
+        postprocessor.submit(self.raw_path)
+        self.assertEqual(postprocessor.close(), [])
+        self.assertEqual(sorted(os.listdir(self.folder)), [
+            'card thumbnail.png', 'card.png'])
+        thumbnail = postprocess.Image.open(
+            os.path.join(self.folder, 'card thumbnail.png'))
+        self.assertEqual(thumbnail.size[0], 100)
+
+
+class TestTextFit(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.measured = []
+        self.metrics = textfit.FontMetrics(self.measure)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def measure(self, text, font, size):
+        """ Monospaced font: each character is half the size wide. """
+        self.measured.append((text, size))
+        return len(text) * size / 2.0, size, 0, 0
+
+    def test_fits_as_is(self):
+        self.assertEqual(textfit.fit_font_size(
+            self.metrics, 'Short', 'Arial', 20, (100, 40)), 20)
+
+    def test_shrink(self):
+        text = 'Enjoy the weather. Having something fluffy helps.'
+        # Three lines of 22 characters at most.
+        self.assertEqual(textfit.fit_font_size(
+            self.metrics, text, 'Arial', 40, (200, 60), line_spacing=2), 18)
+        self.assertFalse(textfit._fits(
+            self.metrics, text, 'Arial', 19, (200, 60), 2, 0))
+
+    def test_long_word_and_minimum(self):
+        self.assertEqual(textfit.fit_font_size(
+            self.metrics, 'Supercalifragilistic', 'Arial', 40, (100, 100),
+            letter_spacing=1), 8)
+        self.assertEqual(textfit.fit_font_size(
+            self.metrics, 'Supercalifragilistic', 'Arial', 40, (10, 100),
+            min_size=4), 4)
+
+    def test_cache(self):
+        self.assertEqual(textfit.fit_font_size(
+            self.metrics, 'A B C D', 'Arial', 40, (50, 50)), 25)
+        count = len(self.measured)
+        self.assertEqual(count, self.metrics.misses)
+        textfit.fit_font_size(self.metrics, 'A B C D', 'Arial', 40, (50, 50))
+        self.assertEqual(len(self.measured), count)
+
+        self.metrics.file_path = os.path.join(self.folder, 'metrics.json')
+        self.metrics.save()
+        metrics = textfit.FontMetrics(self.measure, self.metrics.file_path)
+        self.assertEqual(textfit.fit_font_size(
+            metrics, 'A B C D', 'Arial', 40, (50, 50)), 25)
+        self.assertEqual(metrics.misses, 0)
+        self.assertFalse(os.path.exists(self.metrics.file_path + '.tmp'))
+
+        # Nothing new measured, nothing written.
+        os.remove(metrics.file_path)
+        metrics.save()
+        self.assertFalse(os.path.exists(metrics.file_path))
+
+    def test_corrupt_cache(self):
+        file_path = os.path.join(self.folder, 'metrics.json')
+        with open(file_path, 'w') as file_:
+            file_.write('{"Arial\t20.0')
+        metrics = textfit.FontMetrics(self.measure, file_path)
+        self.assertEqual(metrics.cache, {})
+        metrics.extents('A', 'Arial', 20)
+        metrics.save()
+        self.assertEqual(
+            textfit.FontMetrics(self.measure, file_path).cache,
+            metrics.cache)
+
+
 if __name__ == '__main__':
     unittest.main(exit=False)
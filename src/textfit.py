@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Supplemental script which fits text into a box.
+
+Find the largest font size at which a text fits its text layer. Sizes
+are tried on measured text extents only, no layer is made until the
+size is chosen. Measurements are cached and the cache can be kept in
+a file, so repeated texts (even across runs) are measured only once.
+"""
+
+
+__all__ = ['FontMetrics', 'fit_font_size']
+# Needs :class:`blueprint`. See below.
+__version__ = None
+__author__ = None
+
+
+import io
+import json
+import math
+import os
+import sys
+
+# Same folder as this script.
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import blueprint  # nopep8
+from batch import _text  # nopep8
+
+
+__version__ = blueprint.__version__
+__author__ = blueprint.__author__
+
+
+class FontMetrics():
+    """ Cached text extents.
+
+    :param measure: Extents of a text, called as ``measure(text, font,
+        size)`` and returning width and height in pixels, e.g. by Gimp's
+        ``gimp_text_get_extents_fontname``
+    :type measure: callable
+    :param file_path: Cache file, loaded if it exists (a corrupt one is
+        ignored), defaults to None (cache kept in memory only)
+    :type file_path: str or None, optional
+    """
+
+    def __init__(self, measure, file_path=None):
+        self.measure = measure
+        self.file_path = file_path
+        self.cache = {}  # dict { key: [width, height] }
+        self.misses = 0
+        if file_path is not None and os.path.exists(file_path):
+            try:
+                with io.open(file_path, 'r', encoding='utf-8') as file_:
+                    self.cache = json.load(file_)
+            except ValueError:
+                print('Font metrics "{}" corrupt, measuring again.'.format(
+                    file_path))
+
+    def extents(self, text, font, size, letter_spacing=0):
+        """ Width and height of the text on a single line.
+
+        Letter spacing widens the text by itself between each two
+        characters.
+
+        :param text: Text without newlines
+        :type text: str
+        :param font: Font name
+        :type font: str
+        :param size: Font size in pixels
+        :type size: float
+        :param letter_spacing: Letters separation change, defaults to 0
+        :type letter_spacing: float, optional
+        :return: Width and height in pixels
+        :rtype: tuple
+        """
+        key = u'\t'.join(_text(item) for item in (
+            font, float(size), float(letter_spacing), text))
+        if key not in self.cache:
+            self.misses += 1
+            width, height = self.measure(text, font, size)[:2]
+            width += letter_spacing * max(len(_text(text)) - 1, 0)
+            self.cache[key] = [width, height]
+        return tuple(self.cache[key])
+
+    def save(self):
+        """ Write the cache into its file, if it has one.
+
+        Only if anything was measured since loading. A temporary file
+        replaces the old one, so an interrupted run never leaves it half
+        written.
+        """
+        if self.file_path is None or not self.misses:
+            return
+        temporary = self.file_path + '.tmp'
+        # ASCII only, so that Python 2 writes it the same way.
+        with io.open(temporary, 'w', encoding='utf-8') as file_:
+            file_.write(_text(json.dumps(self.cache, sort_keys=True)))
+        if hasattr(os, 'replace'):
+            os.replace(temporary, self.file_path)
+        else:
+            # Python 2 on Windows cannot rename over an existing file.
+            if os.path.exists(self.file_path):
+                os.remove(self.file_path)
+            os.rename(temporary, self.file_path)
+
+
+def _fits(metrics, text, font, size, box, line_spacing, letter_spacing):
+    """ Does the text wrapped into the box width fit its height?
+
+    Lines are wrapped at spaces, as Gimp's text layer of fixed size does.
+    A word wider than the box never fits.
+
+    :rtype: bool
+    """
+    width, height = box
+
+    def extents(text_):
+        return metrics.extents(text_, font, size, letter_spacing)
+
+    space = extents(u'x x')[0] - extents(u'xx')[0]
+    line_height = extents(u'Xg')[1]
+    lines = 0
+    for paragraph in _text(text).split(u'\n'):
+        line_width = None
+        lines += 1
+        for word in paragraph.split(u' '):
+            word_width = extents(word)[0] if word else 0
+            if word_width > width:
+                return False
+            if line_width is None:
+                line_width = word_width
+            elif line_width + space + word_width <= width:
+                line_width += space + word_width
+            else:
+                line_width = word_width
+                lines += 1
+    return lines * line_height + (lines - 1) * line_spacing <= height
+
+
+def fit_font_size(metrics, text, font, max_size, box, line_spacing=0,
+                  letter_spacing=0, min_size=1):
+    """ Largest font size at which the text fits the box.
+
+    The maximal size is used if the text fits. Otherwise whole sizes are
+    bisected, so there are at most about log2(**max_size**) attempts.
+
+    :param metrics: Measurements cache
+    :type metrics: :class:`FontMetrics`
+    :param text: Text
+    :type text: str
+    :param font: Font name
+    :type font: str
+    :param max_size: Font size to be used if the text fits
+    :type max_size: float
+    :param box: Text layer dimensions in pixels
+    :type box: tuple
+    :param line_spacing: Line separation change, defaults to 0
+    :type line_spacing: float, optional
+    :param letter_spacing: Letters separation change, defaults to 0
+    :type letter_spacing: float, optional
+    :param min_size: Smallest font size allowed, defaults to 1
+    :type min_size: float, optional
+    :return: Font size
+    :rtype: float
+    """
+    def fits(size):
+        return _fits(metrics, text, font, size, box, line_spacing,
+                     letter_spacing)
+
+    if max_size <= min_size or fits(max_size):
+        return max_size
+    # Invariant: low fits (or is the minimum), high does not.
+    low, high = int(math.ceil(min_size)), int(math.ceil(max_size))
+    if low >= max_size or (low > min_size and not fits(low)):
+        return min_size
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle
+    return low
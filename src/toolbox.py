@@ -8,13 +8,16 @@ Written for `Gimp 2.10.18 <https://www.gimp.org/>`_ which uses
 """
 
 
-__all__ = ['Toolbox']
+__all__ = ['Toolbox', 'ExportProfile', 'scale_layer', 'image_name',
+           'localized_name', 'link_file']
 # Needs :class:`blueprint`. See below.
 __version__ = None
 __author__ = None
 
 
+import json
 import os
+import shutil
 import sys
 
 import gimpfu
@@ -22,12 +25,217 @@ import gimpfu
 # Same folder as this script.
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 import blueprint  # nopep8
+import postprocess  # nopep8
+import textfit  # nopep8
 
 
 __version__ = blueprint.__version__
 __author__ = blueprint.__author__
 
 
+#: Image name if none given by the ``image`` layer.
+DEFAULT_IMAGE_NAME = 'Card Assembler Image'
+
+#: Image parasite mapping layout layers to Gimp tattoos, see
+#: :meth:`Toolbox.recolor_image`.
+LAYERS_PARASITE = 'card-assembler-layers'
+
+#: Layer parameters given in pixels, see :func:`scale_layer`.
+PIXEL_PARAMETERS = ['size', 'position', 'font_size', 'min_font_size',
+                    'line_spacing', 'letter_spacing']
+
+
+def scale_layer(layer, scale):
+    """ Proof version of a layer: all pixel parameters scaled.
+
+    The layer is not copied, scaled values are overlaid on top of it.
+    Percentage based parameters (``select``, ``mask``) need no scaling.
+
+    :param layer: Resolved layer
+    :type layer: dict or :class:`blueprint.Overlay`
+    :param scale: Scale factor
+    :type scale: float
+    :return: Scaled layer
+    :rtype: :class:`blueprint.Overlay`
+    """
+    scaled = {}
+    for key in PIXEL_PARAMETERS:
+        if key not in layer:
+            continue
+        value = layer[key]
+        if key == 'size':
+            scaled[key] = tuple(max(1, int(round(item * scale)))
+                                for item in value)
+        elif isinstance(value, tuple):
+            scaled[key] = tuple(int(round(item * scale)) for item in value)
+        else:
+            scaled[key] = float(value) * scale
+    return blueprint.Overlay([scaled, layer])
+
+
+def image_name(layout):
+    """ Name of the image the given layout assembles.
+
+    :param layout: Resolved layout
+    :type layout: list
+    :return: ``name`` of the (last) ``image`` layer
+    :rtype: str
+    """
+    name = DEFAULT_IMAGE_NAME
+    for layer_name, layer in layout:
+        if layer.get('layer_type') == 'image':
+            name = layer.get('name', DEFAULT_IMAGE_NAME)
+    return name
+
+
+def localized_name(name, language):
+    """ Image name of a translated card.
+
+    :param name: Image name
+    :type name: str
+    :param language: Language
+    :type language: str
+    :return: E.g. "Soothing winds (cs)"
+    :rtype: str
+    """
+    return '{} ({})'.format(name, language)
+
+
+def link_file(source, filename):
+    """ Hard link the file if possible, copy it otherwise.
+
+    An existing file of the new name is replaced.
+
+    :param source: Existing file
+    :type source: str
+    :param filename: The new file
+    :type filename: str
+    """
+    if os.path.abspath(filename) == os.path.abspath(source):
+        return
+    if os.path.exists(filename):
+        os.remove(filename)
+    try:
+        os.link(source, filename)
+    # Python 2.7 on Windows has no link, other file systems may refuse.
+    except (AttributeError, OSError):
+        shutil.copyfile(source, filename)
+
+
+def _unlink_shared(filename):
+    """ Remove the file if it is hard linked (see :func:`link_file`).
+
+    Writing into a linked file would change the other links too. Once
+    removed, the file is written anew and the others keep theirs.
+
+    :param filename: File about to be written
+    :type filename: str
+    """
+    if os.path.exists(filename) and os.stat(filename).st_nlink > 1:
+        os.remove(filename)
+
+
+def _proof_cache_name(filename, scale):
+    """ File name of a scaled data image in the proof cache.
+
+    The whole path relative to the data folder is kept, separators
+    escaped, so same named data images of different folders differ.
+
+    :param filename: Data image, relative to the data folder
+    :type filename: str
+    :param scale: Scale factor
+    :type scale: float
+    :return: E.g. "0.25x frames%2FCorner.xcf" for "frames/Corner.png"
+    :rtype: str
+    """
+    name = os.path.splitext(filename)[0].replace('%', '%25')
+    for separator in ('/', ':', '\\'):
+        name = name.replace(separator, '%{:02X}'.format(ord(separator)))
+    return '{:g}x {}.xcf'.format(scale, name)
+
+
+class ExportProfile():
+    """ One export of an assembled image, see :meth:`Toolbox.export_image`.
+
+    :param name: Appended to the image name, defaults to "" (nothing)
+    :type name: str, optional
+    :param file_format: File extension, defaults to "png"
+    :type file_format: str, optional
+    :param size: Longer side in pixels, defaults to None (no scaling)
+    :type size: int or None, optional
+    :param resampling: Scaling interpolation, one of :data:`RESAMPLING`,
+        defaults to "cubic"
+    :type resampling: str, optional
+    :param dpi: Resolution written into the file, defaults to None (keep)
+    :type dpi: float or None, optional
+    :raises ValueError: If resampling is unknown
+    """
+
+    #: Interpolation names to Gimp's interpolation types.
+    RESAMPLING = {'none': 0, 'linear': 1, 'cubic': 2, 'nohalo': 3,
+                  'lohalo': 4}
+
+    def __init__(self, name='', file_format='png', size=None,
+                 resampling='cubic', dpi=None):
+        if resampling not in self.RESAMPLING:
+            raise ValueError('Unknown resampling "{}".'.format(resampling))
+        self.name = name
+        self.file_format = file_format.lower()
+        self.size = size
+        self.resampling = resampling
+        self.dpi = dpi
+
+    @classmethod
+    def parse(cls, text):
+        """ Profiles from text, one per line.
+
+        Line "web: format=jpg size=1200 resampling=lohalo dpi=72" gives
+        a profile named "web". Omitted parameters take defaults.
+
+        :param text: Newline-separated profiles
+        :type text: str
+        :raises ValueError: If a line is malformed
+        :return: Profiles
+        :rtype: list
+        """
+        profiles = []
+        for line in text.split('\n'):
+            if not line.strip():
+                continue
+            name, colon, parameters = line.partition(':')
+            if not colon:
+                raise ValueError('Malformed export profile "{}".'.format(line))
+            kwargs = {}
+            for parameter in parameters.split():
+                key, equals, value = parameter.partition('=')
+                if not equals or key not in (
+                        'format', 'size', 'resampling', 'dpi'):
+                    raise ValueError('Malformed export profile "{}".'.format(
+                        line))
+                if key == 'format':
+                    kwargs['file_format'] = value
+                elif key == 'size':
+                    kwargs['size'] = int(value)
+                elif key == 'dpi':
+                    kwargs['dpi'] = float(value)
+                else:
+                    kwargs[key] = value
+            profiles.append(cls(name.strip(), **kwargs))
+        return profiles
+
+    def scaled_size(self, width, height):
+        """ Export dimensions of an image of the given dimensions.
+
+        :return: Width and height keeping the aspect ratio
+        :rtype: tuple
+        """
+        if self.size is None:
+            return width, height
+        ratio = float(self.size) / max(width, height)
+        return (max(1, int(round(width * ratio))),
+                max(1, int(round(height * ratio))))
+
+
 class Toolbox():
     """ Blueprint-to-image manipulation tool.
 
@@ -48,7 +256,21 @@ class Toolbox():
         print('-' * 20)
         self.gimp_image = None
         self.gimp_image_imported = {}  # dict { name: <Gimp image object> }
+        # Text layers of the last assembled image, see localize_image.
+        self.assembled_image = None
+        self.text_layers = {}  # dict { layout layer name: <Gimp layer> }
+        # Export paths of saved images, see export_copies.
+        self.exports = {}  # dict { image name: [export path] }
+        # Selection rectangles of all images, see _selection_rectangle.
+        self.selections = {}  # dict { selection key: (x, y, w, h) }
         self.save_directory = 'Saved images/'
+        # Proof mode, see create_image.
+        self.scale = 1
+        self.proof_save_directory = 'Saved proofs/'
+        self.proof_cache_directory = 'Proof cache/'
+        # Text extents for auto-fit, kept across runs. See _layer_text.
+        self.font_metrics = textfit.FontMetrics(
+            self._measure_text, self.data_folder + 'Font metrics.json')
         self.add_layer = {
             'image': self._layer_image,
             'monochrome': self._layer_monochrome,
@@ -61,13 +283,20 @@ class Toolbox():
             'hide': self._layer_hide,
         }
 
-    def create_image(self, card_ID):
+    def create_image(self, card_ID, scale=1):
         """Blueprint to image.
 
         Layout consists of layers which are called alphabetically.
 
+        Proof mode (**scale** other than 1) renders a scaled down card
+        quickly for layout review. Pixel parameters are scaled (see
+        :func:`scale_layer`) and data images are replaced by theirs
+        scaled copies, made once and kept in :attr:`proof_cache_directory`.
+
         :param card_ID: Path to the starting node.
         :type card_ID: str
+        :param scale: Proof scale factor, defaults to 1 (full resolution)
+        :type scale: float, optional
         :raises RuntimeError: If there is no blueprint
         :raises KeyError: If any of the layers has no type
         :raises ValueError: If any of the layers has unknown type
@@ -75,8 +304,14 @@ class Toolbox():
         if self.blueprint is None:
             raise RuntimeError('Blueprint must be initialized first!')
         print('Assembling "{}"'.format(card_ID))
-
-        for layer_name, layer in self.blueprint.generate_layout(card_ID):
+        self.scale = scale
+        self.text_layers = {}
+        tattoos = {}  # dict { layout layer name: Gimp tattoo }
+
+        layout = self.blueprint.generate_shared_layout(card_ID)
+        for layer_name, layer in layout:
+            if scale != 1:
+                layer = scale_layer(layer, scale)
             LAYER_TYPE = 'layer_type'
             if LAYER_TYPE not in layer:
                 raise KeyError('Layer "{}" is missing {} tag.'.format(
@@ -87,14 +322,62 @@ class Toolbox():
                 raise ValueError('Unknown layer type "{}" in "{}"'.format(
                     layer_type, layer_name))
 
-            self.add_layer[layer_type](**layer)
+            new_layer = self.add_layer[layer_type](**layer)
+            if layer_type == 'text':
+                self.text_layers[layer_name] = new_layer
+            if layer_type in blueprint.Blueprint.COLORED_LAYER_TYPES:
+                tattoos[layer_name] = gimpfu.pdb.gimp_item_get_tattoo(
+                    new_layer)
             print('Layer "{}" of type "{}" done.'.format(
                 layer_name, layer_type))
 
+        # Persistent, so saved files and theirs duplicates keep it too.
+        self.image.attach_new_parasite(
+            LAYERS_PARASITE, 1, json.dumps(tattoos, sort_keys=True))
+        self.assembled_image = self.image
         display = gimpfu.pdb.gimp_display_new(self.image)
         print('-' * 20)
 
-    def _layer_image(self, size, name='Card Assembler Image', **kwargs):
+    def localize_image(self, card_ID, language):
+        """ Translated copy of the last assembled image.
+
+        Only the text layers are changed (auto-fitted ones also get
+        theirs font size again), everything else is shared with the
+        original (see :meth:`blueprint.Blueprint.load_strings`). The
+        copy becomes the current image, named "**image.name** (language)".
+
+        :param card_ID: Path to the starting node of the assembled image
+        :type card_ID: str
+        :param language: Language of the loaded string table
+        :type language: str
+        """
+        print('Translating "{}" into "{}"'.format(card_ID, language))
+        layout = self.blueprint.generate_shared_layout(card_ID, language)
+        self.image = gimpfu.pdb.gimp_image_duplicate(self.assembled_image)
+        gimpfu.pdb.gimp_image_set_filename(
+            self.image, localized_name(image_name(layout), language))
+
+        layers = dict(layout)
+        for layer_name, text_layer in self.text_layers.items():
+            # Duplicate keeps tattoos, the layers' unique IDs.
+            new_layer = gimpfu.pdb.gimp_image_get_layer_by_tattoo(
+                self.image, gimpfu.pdb.gimp_item_get_tattoo(text_layer))
+            layer = layers[layer_name]
+            gimpfu.pdb.gimp_text_layer_set_text(new_layer, layer['text'])
+            if layer.get('auto_fit') and 'size' in layer:
+                if self.scale != 1:
+                    layer = scale_layer(layer, self.scale)
+                gimpfu.pdb.gimp_text_layer_set_font_size(
+                    new_layer, textfit.fit_font_size(
+                        self.font_metrics, layer['text'], layer['font'],
+                        layer['font_size'] * layer.get('font_scale', 1),
+                        layer['size'], layer.get('line_spacing', 0),
+                        layer.get('letter_spacing', 0),
+                        layer.get('min_font_size', 1)),
+                    gimpfu.PIXELS)
+        display = gimpfu.pdb.gimp_display_new(self.image)
+
+    def _layer_image(self, size, name=DEFAULT_IMAGE_NAME, **kwargs):
         """ Create new image. Needed for layer creation.
 
         :param size: Image dimensions in pixels
@@ -103,6 +386,7 @@ class Toolbox():
         :type name: str
         """
         self.image = gimpfu.pdb.gimp_image_new(size[0], size[1], gimpfu.RGB)
+        self.image_size = tuple(size)
         gimpfu.pdb.gimp_image_set_filename(self.image, name)
 
     def _layer_monochrome(self, size, color, name='Monochrome',
@@ -132,6 +416,7 @@ class Toolbox():
         gimpfu.pdb.gimp_layer_set_offsets(new_layer, *position)
         gimpfu.pdb.gimp_context_set_foreground(color)
         gimpfu.pdb.gimp_drawable_edit_bucket_fill(new_layer, 0, 0, 0)
+        return new_layer
 
     def _layer_import_layer_load(self, filename, name, **kwargs):
         """ Load new data image.
@@ -149,9 +434,43 @@ class Toolbox():
         :raises RuntimeError: If there is no image
         """
         filepath = self.data_folder + filename
+        if self.scale != 1:
+            self.gimp_image_imported[name] = self._load_proof_data_image(
+                filename)
+            return
         self.gimp_image_imported[name] = gimpfu.pdb.gimp_file_load(
             filepath, filepath)
 
+    def _load_proof_data_image(self, filename):
+        """ Load a data image scaled by :attr:`scale`.
+
+        The scaled copy is saved into :attr:`proof_cache_directory` and
+        reused until the original data image changes.
+
+        :param filename: Original data image, relative to the data folder
+        :type filename: str
+        :return: Scaled data image
+        :rtype: <Gimp image object>
+        """
+        filepath = self.data_folder + filename
+        directory = self.data_folder + self.proof_cache_directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+            print('Directory created: {}'.format(directory))
+        cached = directory + _proof_cache_name(filename, self.scale)
+
+        if (os.path.exists(cached)
+                and os.path.getmtime(cached) >= os.path.getmtime(filepath)):
+            return gimpfu.pdb.gimp_file_load(cached, cached)
+
+        image = gimpfu.pdb.gimp_file_load(filepath, filepath)
+        size = (gimpfu.pdb.gimp_image_width(image),
+                gimpfu.pdb.gimp_image_height(image))
+        gimpfu.pdb.gimp_image_scale(image, *[
+            max(1, int(round(item * self.scale))) for item in size])
+        gimpfu.pdb.gimp_xcf_save(0, image, None, cached, cached)
+        return image
+
     def _layer_import_layer(self, target_file, target_layer, add_to_position=0,
                             name=None, position=(0, 0), **kwargs):
         """ Copy layer from a data image.
@@ -206,9 +525,12 @@ class Toolbox():
     def _layer_text(self, text, font, font_size, font_scale=1,
                     add_to_position=0, name=None, color='#000000', size=None,
                     line_spacing=0, letter_spacing=0, justification=0,
-                    position=(0, 0), **kwargs):
+                    position=(0, 0), auto_fit=0, min_font_size=1, **kwargs):
         """ Text layer.
 
+        With **auto_fit**, the font size is lowered until the text fits
+        the layer's **size** (see :func:`textfit.fit_font_size`).
+
         :param text: Text
         :type text: str
         :param font: Font name
@@ -236,12 +558,22 @@ class Toolbox():
         :type justification: int, optional
         :param position: Defaults to (0, 0)
         :type position: tuple, optional
+        :param auto_fit: Shrink the font to fit **size**, defaults to 0
+        :type auto_fit: int, optional
+        :param min_font_size: Auto-fit font size limit, defaults to 1
+        :type min_font_size: float, optional
         :raises RuntimeError: If there is no image
+        :return: The new layer
+        :rtype: <Gimp text layer>
         """
         if self.image is None:
             raise RuntimeError('Image to add the layer to not found.')
 
         font_size_final = font_size * font_scale
+        if auto_fit and size is not None:
+            font_size_final = textfit.fit_font_size(
+                self.font_metrics, text, font, font_size_final, size,
+                line_spacing, letter_spacing, min_font_size)
         textLayer = gimpfu.pdb.gimp_text_layer_new(
             self.image, text, font, font_size_final, 0)
         self.image.add_layer(textLayer, add_to_position)
@@ -255,6 +587,16 @@ class Toolbox():
             textLayer, letter_spacing)
         gimpfu.pdb.gimp_text_layer_set_justification(textLayer, justification)
         gimpfu.pdb.gimp_layer_set_offsets(textLayer, *position)
+        return textLayer
+
+    def _measure_text(self, text, font, size):
+        """ Text extents measured by Gimp, see :class:`textfit.FontMetrics`.
+
+        :return: Width and height in pixels
+        :rtype: tuple
+        """
+        return gimpfu.pdb.gimp_text_get_extents_fontname(
+            text, size, gimpfu.PIXELS, font)[:2]
 
     def _layer_select(self, mode='select', left=0, right=100,
                       top=0, bottom=100, **kwargs):
@@ -284,22 +626,9 @@ class Toolbox():
             raise RuntimeError('Image to add the layer to not found.')
 
         if mode.startswith('select'):
-            x = round(gimpfu.pdb.gimp_image_width(self.image) * left / 100)
-            y = round(gimpfu.pdb.gimp_image_height(self.image) * top / 100)
-            width = round(
-                gimpfu.pdb.gimp_image_width(self.image) * right / 100) - x
-            height = round(
-                gimpfu.pdb.gimp_image_height(self.image) * bottom / 100) - y
-            if width <= 0:
-                raise ArithmeticError(
-                    'Select: parameter "left" must be lesser than "right".')
-            if height <= 0:
-                raise ArithmeticError(
-                    'Select: parameter "top" must be lesser than "bottom".')
-
             gimpfu.pdb.gimp_image_select_rectangle(
                 self.image, 0,  # GIMP_CHANNEL_OP_ADD
-                x, y, width, height)
+                *self._selection_rectangle(left, right, top, bottom))
             # Be aware of possible interference with _layer_mask() deselect.
             if mode == 'select_invert':
                 gimpfu.pdb.gimp_selection_invert(self.image)
@@ -331,6 +660,33 @@ class Toolbox():
         kwargs['mode'] = 'deselect'
         self._layer_select(**kwargs)
 
+    def _selection_rectangle(self, left, right, top, bottom):
+        """ Selection rectangle in pixels of the current image.
+
+        Computed once per image size and percentages, then reused by
+        all the images (see :meth:`_layer_select`).
+
+        :raises ArithmeticError: If width is not positive
+        :raises ArithmeticError: If height is not positive
+        :return: X, y, width and height
+        :rtype: tuple
+        """
+        key = self.image_size + (left, right, top, bottom)
+        if key not in self.selections:
+            image_width, image_height = self.image_size
+            x = round(image_width * left / 100)
+            y = round(image_height * top / 100)
+            width = round(image_width * right / 100) - x
+            height = round(image_height * bottom / 100) - y
+            if width <= 0:
+                raise ArithmeticError(
+                    'Select: parameter "left" must be lesser than "right".')
+            if height <= 0:
+                raise ArithmeticError(
+                    'Select: parameter "top" must be lesser than "bottom".')
+            self.selections[key] = (x, y, width, height)
+        return self.selections[key]
+
     def _layer_hide(self, **kwargs):
         """ Ignore command.
 
@@ -338,20 +694,251 @@ class Toolbox():
         """
         pass
 
-    def save_image(self):
+    def save_image(self, postprocessor=None, profiles=None):
         """ Save the image.
 
         Filemane: **image.name**.xcf into folder :attr:`saveDirectory`
-        (subfolder of :attr:`dataFolder`).
+        (subfolder of :attr:`dataFolder`). Proofs (see :meth:`create_image`)
+        go to :attr:`proof_save_directory` instead.
+
+        :param postprocessor: Post-process PNG exports by it (see
+            :meth:`export_image`), defaults to None
+        :type postprocessor: :class:`postprocess.PostProcessor` or None,
+            optional
+        :param profiles: Exports besides the XCF, defaults to None (one
+            full size PNG if there is a postprocessor)
+        :type profiles: list or None, optional
+        :return: Path of the saved file
+        :rtype: str
         """
-        directory = self.data_folder + self.save_directory
+        name = gimpfu.pdb.gimp_image_get_name(self.image)
+        filename = self._save_path(name)
+        gimpfu.pdb.gimp_xcf_save(0, self.image, None, filename, filename)
+        if profiles or postprocessor is not None:
+            self.export_image(self.image, name, profiles, postprocessor)
+        return filename
+
+    def export_image(self, image, name, profiles=None, postprocessor=None):
+        """ Export the image according to each of the profiles.
+
+        The image is flattened (composited) only once. Each profile
+        scales a copy of the composite in memory.
+
+        PNG exports are handed over to the **postprocessor** if given:
+        only written uncompressed here, compression and the rest runs in
+        the post-processing workers. Exports hard linked to another
+        card's are unlinked first, so that the other card keeps them.
+
+        :param image: Assembled image
+        :type image: <Gimp image object>
+        :param name: Image name
+        :type name: str
+        :param profiles: Exports, defaults to None (one full size PNG)
+        :type profiles: list or None, optional
+        :param postprocessor: Post-processing workers, defaults to None
+        :type postprocessor: :class:`postprocess.PostProcessor` or None,
+            optional
+        :return: Paths of the exports (post-processed ones when done),
+            also kept in :attr:`exports`
+        :rtype: list
+        """
+        paths = []
+        flat_image = gimpfu.pdb.gimp_image_duplicate(image)
+        gimpfu.pdb.gimp_image_flatten(flat_image)
+        # Interpolation is set for the exports only.
+        gimpfu.pdb.gimp_context_push()
+        try:
+            size = (gimpfu.pdb.gimp_image_width(flat_image),
+                    gimpfu.pdb.gimp_image_height(flat_image))
+            for profile in profiles or [ExportProfile()]:
+                export_name = ' '.join((name, profile.name)).rstrip()
+                export_image = gimpfu.pdb.gimp_image_duplicate(flat_image)
+                if profile.scaled_size(*size) != size:
+                    gimpfu.pdb.gimp_context_set_interpolation(
+                        ExportProfile.RESAMPLING[profile.resampling])
+                    gimpfu.pdb.gimp_image_scale(
+                        export_image, *profile.scaled_size(*size))
+                if profile.dpi is not None:
+                    gimpfu.pdb.gimp_image_set_resolution(
+                        export_image, profile.dpi, profile.dpi)
+                layer = gimpfu.pdb.gimp_image_get_active_drawable(export_image)
+
+                if profile.file_format == 'png' and postprocessor is not None:
+                    raw_path = self._save_path(
+                        export_name, postprocess.RAW_SUFFIX)
+                    outputs = postprocess.output_paths(
+                        raw_path, postprocessor.tasks)
+                    for filename in outputs:
+                        _unlink_shared(filename)
+                    # No interlace, compression nor chunks but resolution.
+                    gimpfu.pdb.file_png_save(
+                        export_image, layer, raw_path, raw_path,
+                        0, 0, 0, 0, 0, int(profile.dpi is not None), 0)
+                    postprocessor.submit(raw_path)
+                    paths.extend(outputs)
+                else:
+                    filename = self._save_path(
+                        export_name, '.' + profile.file_format)
+                    _unlink_shared(filename)
+                    gimpfu.pdb.gimp_file_save(
+                        export_image, layer, filename, filename)
+                    paths.append(filename)
+                gimpfu.pdb.gimp_image_delete(export_image)
+        finally:
+            gimpfu.pdb.gimp_context_pop()
+            gimpfu.pdb.gimp_image_delete(flat_image)
+        self.exports[name] = paths
+        return paths
+
+    def _save_path(self, name, extension='.xcf'):
+        """ Where to save an image of the given name.
+
+        Creates the directory if needed.
+
+        :param name: Image name
+        :type name: str
+        :param extension: File extension, defaults to ".xcf"
+        :type extension: str, optional
+        :return: File path
+        :rtype: str
+        """
+        directory = self.data_folder + (
+            self.save_directory if self.scale == 1
+            else self.proof_save_directory)
         if not os.path.exists(directory):
             os.makedirs(directory)
             print('Directory created: {}'.format(directory))
-        filename = '{directory}{name}.xcf'.format(
-            directory=directory,
-            name=gimpfu.pdb.gimp_image_get_name(self.image))
-        gimpfu.pdb.gimp_xcf_save(0, self.image, None, filename, filename)
+        return '{directory}{name}{extension}'.format(
+            directory=directory, name=name, extension=extension)
+
+    def duplicate_image(self, source, name):
+        """ Reuse an assembled image for another card of the same layout.
+
+        The copy becomes the current image and is displayed.
+
+        :param source: Assembled image
+        :type source: <Gimp image object>
+        :param name: The copy's name
+        :type name: str
+        """
+        print('Duplicating as "{}"'.format(name))
+        self.image = gimpfu.pdb.gimp_image_duplicate(source)
+        gimpfu.pdb.gimp_image_set_filename(self.image, name)
+        display = gimpfu.pdb.gimp_display_new(self.image)
+
+    def copy_saved_image(self, source, name):
+        """ Reuse a saved image for another card of the same layout.
+
+        Hard link the file if possible, copy it otherwise.
+
+        :param source: Path of the saved image
+        :type source: str
+        :param name: Image name of the other card
+        :type name: str
+        :return: Path of the new file
+        :rtype: str
+        """
+        filename = self._save_path(name)
+        if os.path.abspath(filename) != os.path.abspath(source):
+            print('Copying as "{}"'.format(name))
+            link_file(source, filename)
+        return filename
+
+    def export_copies(self, source, name):
+        """ Exports of another card of the same layout under this name.
+
+        Exports are not copied right away, post-processed ones may not
+        have been written yet. Copy them by :func:`link_file`.
+
+        :param source: Image name of the exported card
+        :type source: str
+        :param name: Image name of the other card
+        :type name: str
+        :return: Pairs of the export path and the copy path
+        :rtype: list
+        """
+        prefix = self._save_path(source, '')
+        return [(path, self._save_path(name, path[len(prefix):]))
+                for path in self.exports.get(source, [])]
+
+    def recolor_image(self, card_ID, layer_names, language=None,
+                      profiles=None, postprocessor=None):
+        """ Refill colors of a saved image by the current blueprint.
+
+        Much faster than assembling the card again when only colors
+        changed (see :meth:`blueprint.Blueprint.color_index`). The image
+        saved by :meth:`save_image` is opened, the given ``monochrome``
+        layers are refilled and the given ``text`` layers get the new
+        text color. Layers are found by theirs tattoos, recorded by
+        :meth:`create_image`, so renamed or duplicate names do not matter.
+        Nothing is changed if any of the layers is missing.
+
+        :param card_ID: Path to the starting node
+        :type card_ID: str
+        :param layer_names: Layout layers to be recolored
+        :type layer_names: list
+        :param language: Recolor the translated copy, defaults to None
+        :type language: str or None, optional
+        :param profiles: Export again, see :meth:`export_image`, defaults
+            to None (keep the exports)
+        :type profiles: list or None, optional
+        :param postprocessor: Post-process PNG exports by it (a full size
+            PNG is exported again even without **profiles**), defaults
+            to None
+        :type postprocessor: :class:`postprocess.PostProcessor` or None,
+            optional
+        :raises IOError: If the card has not been saved
+        :raises KeyError: If any of the layers is not in the saved image
+        :return: Path of the saved file
+        :rtype: str
+        """
+        layout = self.blueprint.generate_shared_layout(card_ID, language)
+        name = image_name(layout)
+        if language is not None:
+            name = localized_name(name, language)
+        filename = self._save_path(name)
+        if not os.path.exists(filename):
+            raise IOError('Saved image "{}" not found.'.format(filename))
+        print('Recoloring "{}"'.format(name))
+        image = gimpfu.pdb.gimp_xcf_load(0, filename, filename)
+
+        parasite = image.parasite_find(LAYERS_PARASITE)
+        tattoos = json.loads(parasite.data) if parasite else {}
+        drawables = {}
+        for layer_name in layer_names:
+            if layer_name in tattoos:
+                drawables[layer_name] = (
+                    gimpfu.pdb.gimp_image_get_layer_by_tattoo(
+                        image, tattoos[layer_name]))
+        missing = sorted(layer_name for layer_name in layer_names
+                         if drawables.get(layer_name) is None)
+        if missing:
+            gimpfu.pdb.gimp_image_delete(image)
+            raise KeyError('Layers {} not found in "{}", assemble the card '
+                           'again.'.format(', '.join(missing), filename))
+
+        layers = dict(layout)
+        gimpfu.pdb.gimp_context_push()
+        try:
+            for layer_name in layer_names:
+                layer = layers[layer_name]
+                drawable = drawables[layer_name]
+                if layer['layer_type'] == 'monochrome':
+                    gimpfu.pdb.gimp_context_set_foreground(layer['color'])
+                    gimpfu.pdb.gimp_drawable_fill(drawable, 0)  # Foreground.
+                elif layer['layer_type'] == 'text':
+                    gimpfu.pdb.gimp_text_layer_set_color(
+                        drawable, layer['color'])
+        finally:
+            gimpfu.pdb.gimp_context_pop()
+
+        # Hard linked by copy_saved_image, the other cards keep theirs.
+        _unlink_shared(filename)
+        gimpfu.pdb.gimp_xcf_save(0, image, None, filename, filename)
+        if profiles or postprocessor is not None:
+            self.export_image(image, name, profiles, postprocessor)
+        gimpfu.pdb.gimp_image_delete(image)
+        return filename
 
     def create_palette(self, palette_ID, name):
         """ Blueprint to palette.